@@ -0,0 +1,34 @@
+"""Compare the per-character jamo path with the arithmetic batch path of hangul.py"""
+import random
+import argparse
+
+from common import measure
+from corpus_utils import adj_conju, FindConjugation
+from hangul import adj_conju_batch, vowel_batch
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--n", type=int, default = 100000, help = 'The number of generated verbs')
+  parser.add_argument("--repeat", type=int, default = 3)
+  args = parser.parse_args()
+
+  rand = random.Random(0)
+  syllables = [chr(c) for c in range(0xAC00, 0xD7A4)]
+  items = [{'repr' : ''.join(rand.choice(syllables) for _ in range(rand.randint(1, 3))) + '다',
+            'pos' : rand.choice(['형용사', '동사', '동사/형용사']),
+            'conjugation' : rand.choice(['', '', '고와', '구워'])} for _ in range(args.n)]
+  others = ['a', 'Z', '1', 'ㄱ', 'ㅏ', '\ue005', '\U000f0000', '漢'] #non-Hangul stems, which adj_conju_batch leaves to adj_conju
+  items += [{'repr' : rand.choice(syllables) + rand.choice(others) + '다',
+             'pos' : '형용사',
+             'conjugation' : ''} for _ in range(args.n // 100)]
+  chars = [x['repr'][-2] for x in items]
+  finder = FindConjugation(dict())
+
+  for name, scalar, batch, data in [('adj_conju', lambda x : [adj_conju(i) for i in x], adj_conju_batch, items),
+                                    ('vowel', lambda x : [finder.vowel(i) for i in x], 
+                                     lambda x : vowel_batch(x).tolist(), chars)]:
+    expected, scalar_elapsed = measure(scalar, data, repeat = args.repeat)
+    output, batch_elapsed = measure(batch, data, repeat = args.repeat)
+    print('%-9s : jamo %.0f/sec, batch %.0f/sec, x%.1f, identical output : %s' % (
+        name, len(data) / scalar_elapsed, len(data) / batch_elapsed, scalar_elapsed / batch_elapsed, expected == output))
@@ -0,0 +1,63 @@
+"""Throughput and size of korean_dataset.jsonl written per record with json.dumps (the former way)
+and with kordict_io.JsonlWriter (json / orjson backends, plain / gzip / zstandard)
+
+  python benchmarks/bench_jsonl.py --n 20000
+"""
+import json
+import argparse
+import tempfile
+from pathlib import Path
+from importlib.util import find_spec
+
+from common import measure
+from synthetic import skd_dump, okd_dump
+from attrs import asdict
+import kordict_main
+import kordict_io
+
+
+def former(total, path):
+  with open(path, 'w', encoding = 'utf-8') as f:
+    output = list(map(lambda x : asdict(x), total))
+    for i in output:
+      f.write(json.dumps(i) + '\n')
+
+
+def write(total, path, backend):
+  with kordict_io.JsonlWriter(path, backend = backend) as f:
+    f.write_all(total)
+
+
+def read(path, backend):
+  return sum(1 for _ in kordict_io.iter_jsonl(path, backend))
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--n", type=int, default = 20000, help = 'The number of synthetic items per dump')
+  parser.add_argument("--repeat", type=int, default = 3)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    total = list()
+    for idx, (dump, standard) in enumerate([(skd_dump(args.n, 0), True), (okd_dump(args.n, 1), False)]):
+      path = Path(tmp) / ('%d.json' % idx)
+      with open(path, 'w', encoding = 'utf-8') as f:
+        json.dump(dump, f, ensure_ascii = False)
+      total += kordict_main.KordictDataset(path, standard).output
+    total = list(set(total))
+
+    _, elapsed = measure(former, total, Path(tmp) / 'former.jsonl', repeat = args.repeat)
+    size = (Path(tmp) / 'former.jsonl').stat().st_size
+    print('%-22s : %8.0f records/sec, %6.1f MB' % ('former (json.dumps)', len(total) / elapsed, size / 2 ** 20))
+
+    backends = ['json'] + (['orjson'] if kordict_io.orjson != None else list())
+    suffixes = ['', '.gz'] + (['.zst'] if find_spec('zstandard') != None else list())
+    for backend in backends:
+      for suffix in suffixes:
+        path = Path(tmp) / ('%s.jsonl%s' % (backend, suffix))
+        _, elapsed = measure(write, total, path, backend, repeat = args.repeat)
+        n, read_elapsed = measure(read, path, backend, repeat = args.repeat)
+        assert n == len(total)
+        print('%-22s : %8.0f records/sec, %6.1f MB, read %8.0f records/sec' % (
+          '%s%s' % (backend, suffix if suffix != '' else ' (plain)'), len(total) / elapsed, path.stat().st_size / 2 ** 20, n / read_elapsed))
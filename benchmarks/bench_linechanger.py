@@ -0,0 +1,47 @@
+"""Memory and latency of LineChanger.stream against the eager LineChanger on a long synthetic chapter
+
+  git show <rev>:src/data/novel/etc.py > /tmp/etc_old.py
+  python benchmarks/bench_linechanger.py --baseline /tmp/etc_old.py
+"""
+import time
+import argparse
+import tracemalloc
+from itertools import chain
+
+from common import load_module
+from synthetic import paragraphs
+from src.data.novel import etc
+
+
+def eager(module, chapter):
+  return list(chain.from_iterable(module.LineChanger(p).output for p in chapter))
+
+
+def run(name, func, chapter):
+  """Consume the lines, keeping only the count, and report the first-line latency and peak memory"""
+  tracemalloc.start()
+  start, first, count = time.perf_counter(), None, 0
+  for _ in func(chapter):
+    first = time.perf_counter() - start if first == None else first
+    count += 1
+  elapsed = time.perf_counter() - start
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  print('%-8s : %d lines, first line %.2f ms, total %.2f s, peak %.1f MB' % (
+      name, count, first * 1000, elapsed, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--n", type=int, default = 5000, help = 'The number of paragraphs in the chapter')
+  parser.add_argument("--baseline", type=str, default = '', help = 'An older novel/etc.py to compare with')
+  args = parser.parse_args()
+
+  chapter = paragraphs(args.n)
+  run('eager', lambda x : eager(etc, x), chapter)
+  run('stream', etc.LineChanger.stream, chapter)
+  
+  if args.baseline != '':
+    baseline = load_module(args.baseline, 'baseline_etc')
+    run('baseline', lambda x : eager(baseline, x), chapter)
+    print('identical output :', list(etc.LineChanger.stream(chapter)) == eager(baseline, chapter))
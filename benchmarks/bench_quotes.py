@@ -0,0 +1,41 @@
+"""Time the quotation pairing of LineChanger on dialogue-heavy paragraphs and check it against an older novel/etc.py
+
+  git show <rev>:src/data/novel/etc.py > /tmp/etc_old.py
+  python benchmarks/bench_quotes.py --baseline /tmp/etc_old.py
+"""
+import random
+import argparse
+
+from common import load_module, measure
+from synthetic import paragraphs, DIALOGUE
+from src.data.novel import etc
+
+
+def long_paragraphs(n : int, quotes : int, seed : int = 0):
+  """Paragraphs with hundreds of quotation pairs"""
+  rand = random.Random(seed)
+  return [' '.join(rand.choice(DIALOGUE) for _ in range(quotes)) for _ in range(n)]
+
+
+def lines(module, texts):
+  return [module.LineChanger(x).output for x in texts]
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--n", type=int, default = 20, help = 'The number of long paragraphs')
+  parser.add_argument("--quotes", type=int, default = 300, help = 'The number of quotations in a long paragraph')
+  parser.add_argument("--baseline", type=str, default = '', help = 'An older novel/etc.py to compare with')
+  parser.add_argument("--repeat", type=int, default = 3)
+  args = parser.parse_args()
+
+  samples = paragraphs(2000, 1) + long_paragraphs(args.n, args.quotes)
+  texts = long_paragraphs(args.n, args.quotes, 2)
+  output, elapsed = measure(lines, etc, texts, repeat = args.repeat)
+  print('current  : %.1f paragraphs/sec' % (len(texts) / elapsed))
+
+  if args.baseline != '':
+    baseline = load_module(args.baseline, 'baseline_etc')
+    _, base_elapsed = measure(lines, baseline, texts, repeat = args.repeat)
+    print('baseline : %.1f paragraphs/sec, x%.1f' % (len(texts) / base_elapsed, base_elapsed / elapsed))
+    print('identical output :', lines(etc, samples) == lines(baseline, samples))
@@ -0,0 +1,83 @@
+"""Startup time of SearchPattern (the POS maps and the conjugation indexes) with and without
+the bundle saved alongside the dictionary, and opened on the SQLite store (queried on demand), 
+optionally against an older corpus_utils.py
+
+  git show <rev>:src/data/corpus_utils.py > /tmp/corpus_utils_old.py
+  python benchmarks/bench_startup.py --baseline /tmp/corpus_utils_old.py
+"""
+import json
+import argparse
+import tempfile
+from pathlib import Path
+from itertools import groupby
+
+from common import load_module, measure
+from synthetic import skd_dump, okd_dump
+from attrs import asdict
+import kordict_main
+import kordict_store
+import corpus_utils
+
+DERIVED = ['conju_data', 'last_syl_index', 'vowel_index', 'short_cut']
+
+
+def start(module, word_map, **kwargs):
+  """Build a SearchPattern and everything find needs"""
+  output = module.SearchPattern(word_map, **kwargs)
+  for name in DERIVED:
+    if hasattr(type(output), name):
+      getattr(output, name)
+  return output
+
+
+def state(search_pattern):
+  return [search_pattern.verb_map, search_pattern.noun_map, search_pattern.suffix_map] + [
+    getattr(search_pattern, x) for x in DERIVED if hasattr(type(search_pattern), x)]
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--n", type=int, default = 50000, help = 'The number of synthetic items per dump')
+  parser.add_argument("--baseline", type=str, default = '', help = 'An older corpus_utils.py to compare with')
+  parser.add_argument("--repeat", type=int, default = 3)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    total = list()
+    for idx, (dump, standard) in enumerate([(skd_dump(args.n, 0), True), (okd_dump(args.n, 1), False)]):
+      path = Path(tmp) / ('%d.json' % idx)
+      with open(path, 'w', encoding = 'utf-8') as f:
+        json.dump(dump, f, ensure_ascii = False)
+      total += kordict_main.KordictDataset(path, standard).output
+    dictionary = Path(tmp) / 'korean_dataset.json'
+    with open(dictionary, 'w', encoding = 'utf-8') as f:
+      json.dump({k : list(map(asdict, g)) for k, g in groupby(sorted(set(total), key = lambda x : x.repr), key = lambda x : x.repr)},
+                f, ensure_ascii = False)
+
+    word_map = corpus_utils.load_word_map(dictionary)
+    current, elapsed = measure(start, corpus_utils, word_map, repeat = args.repeat)
+    print('%d words' % len(word_map))
+    print('current, no bundle   : %7.1f ms' % (elapsed * 1000))
+
+    current.save_bundle(corpus_utils.bundle_path(dictionary), dictionary)
+    load = lambda : start(corpus_utils, word_map, bundle = corpus_utils.SearchPattern.load_bundle(corpus_utils.bundle_path(dictionary), dictionary))
+    loaded, bundle_elapsed = measure(load, repeat = args.repeat)
+    print('current, with bundle : %7.1f ms (%.1f MB)' % (bundle_elapsed * 1000, corpus_utils.bundle_path(dictionary).stat().st_size / 2 ** 20))
+    print('same maps :', state(current) == state(loaded))
+
+    sqlite = Path(tmp) / 'korean_dataset.sqlite'
+    kordict_store.write_sqlite(total, sqlite)
+    words = [x.repr for x in total[::max(1, len(total) // 2000)]]
+    opened, open_elapsed = measure(lambda : corpus_utils.SearchPattern(corpus_utils.load_word_map(dictionary)), repeat = args.repeat)
+    stored, store_elapsed = measure(lambda : corpus_utils.SearchPattern(corpus_utils.load_word_map(sqlite)), repeat = args.repeat)
+    print('json, load + start   : %7.1f ms, then %d words in %.1f ms' % (
+      open_elapsed * 1000, len(words), measure(opened.get_patterns, words, repeat = 1)[1] * 1000))
+    print('sqlite, open + start : %7.1f ms, then %d words in %.1f ms' % (
+      store_elapsed * 1000, len(words), measure(stored.get_patterns, words, repeat = 1)[1] * 1000))
+    print('same patterns on sqlite :', opened.get_patterns(words) == stored.get_patterns(words))
+
+    if args.baseline != '':
+      baseline = load_module(args.baseline, 'baseline_corpus_utils')
+      expected, base_elapsed = measure(start, baseline, word_map, repeat = args.repeat)
+      print('baseline             : %7.1f ms' % (base_elapsed * 1000))
+      print('same maps as baseline :', [list(x.items()) for x in state(current)[:3]] == [list(x.items()) for x in state(expected)[:3]])
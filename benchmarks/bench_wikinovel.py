@@ -0,0 +1,49 @@
+"""Time the paragraph extraction of WikiNovel on saved pages and check it against an older novel/utils.py
+
+  git show <rev>:src/data/novel/utils.py > /tmp/utils_old.py
+  python benchmarks/bench_wikinovel.py --baseline /tmp/utils_old.py --html_dir html_cache/
+
+Without --html_dir, synthetic pages shaped like ko.wikisource are used.
+With lxml installed, the opt-in lxml parser is timed and checked against the default html.parser too.
+"""
+import argparse
+from pathlib import Path
+from importlib.util import find_spec
+
+from common import load_module, measure
+from synthetic import wiki_page
+from src.data.novel import utils
+
+
+def extract(module, pages, parser = None):
+  kwargs = dict() if parser == None else {'parser' : parser}
+  return [module.WikiNovel('', html, **kwargs).output for html in pages]
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--html_dir", type=str, default = '', help = 'A folder of saved pages (*.html), e.g. a WikiDownloader cache')
+  parser.add_argument("--n", type=int, default = 10, help = 'The number of synthetic pages')
+  parser.add_argument("--chapters", type=int, default = 20, help = 'The number of chapters in a synthetic page')
+  parser.add_argument("--baseline", type=str, default = '', help = 'An older novel/utils.py to compare with')
+  parser.add_argument("--repeat", type=int, default = 3)
+  args = parser.parse_args()
+
+  if args.html_dir != '':
+    pages = [x.read_text(encoding = 'utf-8') for x in sorted(Path(args.html_dir).glob('*.html'))]
+  else:
+    pages = [wiki_page(args.chapters, seed, prose = seed % 2 == 1) for seed in range(args.n)]
+  size = sum(len(x.encode('utf-8')) for x in pages) / 2 ** 20
+
+  output, elapsed = measure(extract, utils, pages, repeat = args.repeat)
+  print('current (%s) : %.2f MB/sec' % (utils.WikiNovel.parser, size / elapsed))
+  if find_spec('lxml') != None:
+    lxml_output, lxml_elapsed = measure(extract, utils, pages, 'lxml', repeat = args.repeat)
+    print('current (lxml) : %.2f MB/sec' % (size / lxml_elapsed))
+    print('identical output with lxml :', lxml_output == output)
+
+  if args.baseline != '':
+    baseline = load_module(args.baseline, 'baseline_utils')
+    base_output, base_elapsed = measure(extract, baseline, pages, repeat = args.repeat)
+    print('baseline : %.2f MB/sec, x%.1f' % (size / base_elapsed, base_elapsed / elapsed))
+    print('identical output :', output == base_output)
@@ -0,0 +1,65 @@
+"""Memory per Wordinfo and dedup time, optionally against an older kordict_main.py.
+The first dedup hashes entries parsed again for every repeat; the second one 
+passes the same entries through set() again, which is what the cached hash speeds up
+
+  git show <rev>:src/data/kordict_main.py > /tmp/kordict_main_old.py
+  python benchmarks/bench_wordinfo.py --baseline /tmp/kordict_main_old.py
+"""
+import gc
+import json
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+from common import load_module, measure
+from synthetic import skd_dump, okd_dump
+import kordict_main
+
+
+def parse(module, paths) -> List:
+  total = list()
+  for path, standard in paths:
+    total += module.KordictDataset(path, standard).output
+  return total
+
+
+def report(module, paths, repeat : int):
+  """Return bytes per entry kept by the parsed entries and the time of the first and a repeated set() dedup"""
+  gc.collect()
+  tracemalloc.start()
+  total = parse(module, paths)
+  gc.collect()
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  
+  first = float('inf')
+  for _ in range(repeat):
+    fresh = parse(module, paths) #new entries, whose hash is not computed yet
+    _, elapsed = measure(lambda : set(fresh), repeat = 1)
+    first = min(first, elapsed)
+  _, again = measure(lambda : set(total), repeat = repeat + 1) #the first repeat hashes, the others find the cached hash
+  return len(total), size / len(total), first, again
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--n", type=int, default = 20000, help = 'The number of synthetic items per dump')
+  parser.add_argument("--baseline", type=str, default = '', help = 'An older kordict_main.py to compare with')
+  parser.add_argument("--repeat", type=int, default = 3)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    paths = [(Path(tmp) / 'skd.json', True), (Path(tmp) / 'okd.json', False)]
+    for (path, _), dump in zip(paths, [skd_dump(args.n, 0), okd_dump(args.n, 1)]):
+      with open(path, 'w') as f:
+        json.dump(dump, f, ensure_ascii = False)
+
+    modules = [('current', kordict_main)]
+    if args.baseline != '':
+      modules.append(('baseline', load_module(args.baseline, 'baseline_kordict_main')))
+
+    for name, module in modules:
+      n, per_entry, first, again = report(module, paths, args.repeat)
+      print('%-8s : %d entries, %.0f bytes/entry, set() dedup %.1f ms first, %.1f ms again' % (name, n, per_entry, first * 1000, again * 1000))
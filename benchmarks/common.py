@@ -0,0 +1,32 @@
+"""Helpers shared by the benchmark scripts"""
+import sys
+import time
+import importlib.util
+from pathlib import Path
+from typing import Any, Callable, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / 'src' / 'data'
+
+#import the modules the same way the scripts under src/data do
+for path in [str(ROOT), str(SRC)]:
+  if path not in sys.path:
+    sys.path.insert(0, path)
+
+
+def load_module(path : str, name : str):
+  """Import a python file under another name (e.g. an older version extracted with git show)"""
+  spec = importlib.util.spec_from_file_location(name, path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+
+def measure(func : Callable, *args, repeat : int = 3) -> Tuple[Any, float]:
+  """Return the output of func and the best elapsed time of the repeats"""
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    output = func(*args)
+    best = min(best, time.perf_counter() - start)
+  return output, best
@@ -0,0 +1,70 @@
+"""Check the import time of the src.data modules with python -X importtime
+
+  python benchmarks/importtime.py
+  python benchmarks/importtime.py --max_ms 150 --top 5
+
+Each module is imported in a fresh interpreter. The check fails (exit code 1) if a module
+pulls in a heavy dependency at import (--heavy), takes longer than --max_ms or cannot be imported.
+A module whose dependency is missing (ModuleNotFoundError, e.g. data.rx_codes of novel.etc) 
+is reported as skipped.
+"""
+import sys
+import argparse
+import subprocess
+from typing import List, Tuple
+
+from common import ROOT, SRC
+
+MODULES = ['kordict_rx', 'kordict_utils', 'kordict_main', 'corpus_utils', 'emotion_matcher',
+           'src.data.novel.etc', 'src.data.novel.pipeline']
+HEAVY = ['numpy', 'pandas', 'tqdm', 'bs4', 'requests']
+
+
+def import_time(module : str) -> Tuple[List[Tuple[int, str]], List[str], str]:
+  """Return (cumulative us, name) of every import, the heavy modules loaded and the error if any"""
+  code = 'import sys, %s; print(",".join(sorted(set(sys.modules) & set(%r))))' % (module, HEAVY)
+  cwd = ROOT if module.startswith('src.') else SRC
+  output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd = cwd, capture_output = True, text = True)
+  if output.returncode != 0:
+    return list(), list(), output.stderr.strip().split('\n')[-1]
+
+  times = list()
+  for line in output.stderr.split('\n'):
+    if line.startswith('import time:') and 'cumulative' not in line:
+      _, cumulative, name = line[len('import time:'):].split('|')
+      times = list() if name.strip() == 'site' else times + [(int(cumulative), name.strip())] #skip the startup
+  return times, [x for x in output.stdout.strip().split(',') if len(x) > 0], ''
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--modules", type=str, default = ','.join(MODULES))
+  parser.add_argument("--heavy", type=str, default = ','.join(HEAVY), help = 'The modules which must not be imported eagerly')
+  parser.add_argument("--max_ms", type=float, default = 0, help = 'The maximum import time of a module, 0 not to check')
+  parser.add_argument("--top", type=int, default = 3, help = 'The number of the slowest dependencies to show')
+  args = parser.parse_args()
+  HEAVY = [x for x in args.heavy.split(',') if len(x) > 0]
+
+  failed = False
+  for module in args.modules.split(','):
+    times, heavy, error = import_time(module)
+    if error.startswith('ModuleNotFoundError'):
+      print('%-26s : skipped, %s' % (module, error))
+      continue
+
+    elif error != '':
+      print('%-26s : failed to import, %s' % (module, error))
+      failed = True
+      continue
+
+    total = dict((name, us) for us, name in times)[module] / 1000
+    slowest = sorted([x for x in times if x[1] != module], reverse = True)[:args.top]
+    print('%-26s : %7.1f ms  (%s)' % (module, total, ', '.join('%s %.1f' % (name, us / 1000) for us, name in slowest)))
+    if len(heavy) > 0:
+      print('  imports %s at load' % ', '.join(heavy))
+      failed = True
+    if args.max_ms > 0 and total > args.max_ms:
+      print('  slower than %.0f ms' % args.max_ms)
+      failed = True
+
+  sys.exit(1 if failed else 0)
@@ -0,0 +1,161 @@
+"""Run every stage of the dictionary and corpus pipeline on synthetic inputs and save the results
+
+  python benchmarks/run.py --n 20000 --save_dir benchmarks/results
+  python benchmarks/run.py --stages clean_repr,line_changer --compare benchmarks/results/<older>.json
+
+Inputs : SKD/OKD shaped dumps (synthetic.py), the lexicons in data/*.csv and data/comparative/*.csv
+and dialogue-heavy paragraphs. Each stage reports its throughput (the best of --repeat runs) and
+the peak memory traced by tracemalloc in one more run, as tracing slows the code down.
+The results are saved as bench_<timestamp>_<git rev>.json.
+"""
+import gc
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import pandas as pd
+from pathlib import Path
+from itertools import groupby
+from typing import Callable, Dict, List, Tuple
+
+from common import ROOT, measure
+from synthetic import skd_dump, okd_dump, paragraphs
+from attrs import asdict
+import kordict_utils
+import kordict_main
+import corpus_utils
+
+NOVEL_STAGES = ['line_changer', 'quotation_changer']
+
+
+def dictionary_entries(dumps : List[Dict]) -> List[Tuple[str, str]]:
+  """Return (word, definition) pairs of the dumps"""
+  output = list()
+  for dump in dumps:
+    for item in dump['channel']['item']:
+      if 'word_info' in item.keys():
+        info = item['word_info']
+        senses = info['pos_info'][0]['comm_pattern_info'][0]['sense_info']
+        output += [(info['word'], x['definition']) for x in senses]
+      else:
+        output.append((item['wordinfo']['word'], item['senseinfo']['definition']))
+  return output
+
+
+def word_infos(dump : Dict) -> List[Dict]:
+  """Return the inputs of Wordinfo.update made from an OKD shaped dump, as KordictDataset._our_info does"""
+  return [{'word' : x['wordinfo']['word'],
+           'unit' : x['wordinfo']['word_unit'],
+           'syntax' : list(),
+           'conjugation' : x['wordinfo'].get('conju_info', list()),
+           'pos' : x['senseinfo'].get('pos', '품사 없음'),
+           'definition' : x['senseinfo']['definition'],
+           'word_type' : x['senseinfo']['type']} for x in dump['channel']['item']]
+
+
+def lexicon_words() -> List[str]:
+  paths = sorted((ROOT / 'data').glob('*.csv')) + sorted((ROOT / 'data' / 'comparative').glob('*.csv'))
+  return [w for path in paths for w in pd.read_csv(path)['word'] if type(w) == str]
+
+
+def get_stages(args, tmp : Path) -> Dict[str, Tuple[Callable, int]]:
+  """Return the function of each stage and the number of items it processes"""
+  skd, okd = skd_dump(args.n, 0), okd_dump(args.n, 1)
+  paths = {'skd' : tmp / 'skd.json', 'okd' : tmp / 'okd.json'}
+  for name, dump in [('skd', skd), ('okd', okd)]:
+    with open(paths[name], 'w', encoding = 'utf-8') as f:
+      json.dump(dump, f, ensure_ascii = False)
+
+  entries, infos = dictionary_entries([skd, okd]), word_infos(okd)
+  texts = paragraphs(args.n, 2)
+  stages = {
+    'clean_repr' : (lambda : [kordict_utils.CleanRepr(w).output for w, _ in entries], len(entries)),
+    'clean_def' : (lambda : [kordict_utils.CleanDef(d, w).output for w, d in entries], len(entries)),
+    'wordinfo_update' : (lambda : [kordict_main.Wordinfo.update(dict(x)) for x in infos], len(infos)),
+    'kordict_skd' : (lambda : kordict_main.KordictDataset(paths['skd'], True).output, args.n),
+    'kordict_okd' : (lambda : kordict_main.KordictDataset(paths['okd'], False).output, args.n),
+  }
+
+  if len(set(NOVEL_STAGES) & set(args.stages)) > 0:
+    try: #novel.etc needs data.rx_codes, which is not in every checkout
+      from src.data.novel import etc
+      stages['line_changer'] = (lambda : [etc.LineChanger(x).output for x in texts], len(texts))
+      stages['quotation_changer'] = (lambda : etc.QuotationChanger(texts).output, len(texts))
+    except ImportError as e:
+      print('skipped %s : %s' % (', '.join(x for x in NOVEL_STAGES if x in args.stages), e))
+
+  if 'search_pattern' in args.stages:
+    total = kordict_main.KordictDataset(paths['skd'], True).output + kordict_main.KordictDataset(paths['okd'], False).output
+    records = sorted([asdict(x) for x in set(total)], key = lambda x : x['repr'])
+    word_map = {k : list(v) for k, v in groupby(records, key = lambda x : x['repr'])}
+    search_pattern, words = corpus_utils.SearchPattern(word_map), lexicon_words()
+
+    def get_patterns():
+      search_pattern.find.cache_clear() #every repeat starts cold
+      return [search_pattern.get_pattern(w) for w in words]
+    stages['search_pattern'] = (get_patterns, len(words))
+
+  return {k : stages[k] for k in args.stages if k in stages.keys()}
+
+
+def run_stage(func : Callable, n_items : int, repeat : int) -> Dict[str, float]:
+  gc.collect()
+  _, elapsed = measure(func, repeat = repeat)
+  gc.collect()
+  tracemalloc.start()
+  func()
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return {'items' : n_items, 'seconds' : elapsed, 'items_per_sec' : n_items / elapsed, 'peak_mb' : peak / 2 ** 20}
+
+
+def git_rev() -> str:
+  try:
+    return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd = ROOT, capture_output = True, text = True).stdout.strip()
+  except OSError:
+    return ''
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  all_stages = ['clean_repr', 'clean_def', 'wordinfo_update', 'kordict_skd', 'kordict_okd',
+                'search_pattern'] + NOVEL_STAGES
+  parser.add_argument("--stages", type=str, default = ','.join(all_stages), help = 'Comma separated: ' + ', '.join(all_stages))
+  parser.add_argument("--n", type=int, default = 20000, help = 'The number of synthetic items per dump and of paragraphs')
+  parser.add_argument("--repeat", type=int, default = 3)
+  parser.add_argument("--save_dir", type=str, default = str(ROOT / 'benchmarks' / 'results'))
+  parser.add_argument("--compare", type=str, default = '', help = 'An older result file to compare with')
+  args = parser.parse_args()
+  args.stages = [x for x in args.stages.split(',') if len(x) > 0]
+  unknown = set(args.stages) - set(all_stages)
+  if len(unknown) > 0:
+    parser.error('unknown stages : %s' % ', '.join(sorted(unknown)))
+
+  result = {'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'rev' : git_rev(),
+            'python' : platform.python_version(),
+            'n' : args.n,
+            'repeat' : args.repeat,
+            'stages' : dict()}
+  previous = dict()
+  if args.compare != '':
+    with open(args.compare, 'r', encoding = 'utf-8') as f:
+      previous = json.load(f)['stages']
+
+  with tempfile.TemporaryDirectory() as tmp:
+    for name, (func, n_items) in get_stages(args, Path(tmp)).items():
+      stats = run_stage(func, n_items, args.repeat)
+      result['stages'][name] = stats
+      line = '%-18s : %8d items, %10.0f items/sec, peak %7.1f MB' % (name, n_items, stats['items_per_sec'], stats['peak_mb'])
+      if name in previous.keys():
+        line += ', x%.2f' % (stats['items_per_sec'] / previous[name]['items_per_sec'])
+      print(line)
+
+  Path(args.save_dir).mkdir(parents = True, exist_ok = True)
+  fname = Path(args.save_dir) / ('bench_%s_%s.json' % (time.strftime('%Y%m%d_%H%M%S'), result['rev'] or 'norev'))
+  with open(fname, 'w', encoding = 'utf-8') as f:
+    json.dump(result, f, ensure_ascii = False, indent = 2)
+  print('saved', fname)
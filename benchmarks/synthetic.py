@@ -0,0 +1,118 @@
+"""Generate synthetic inputs shaped like the real data"""
+import random
+from typing import Dict, List
+
+SYLLABLES = '가나다라마바사아자차카타파하고기쁘슬프즐겁아름답무섭놀랍걷듣좋낫붓곱굽잡업밝맑읽흐르'
+DEFINITIONS = ['‘%s’의 잘못.',
+               '→ ‘%s’',
+               '기분이 좋다. ⇒ 규범 표기는 ‘%s’이다.',
+               '무엇을 함. 또는 그런 것. <동의 속담> ‘%s’',
+               '마음이 <b>기쁘다</b>(喜) ‘%s1’.',
+               '몹시 슬프다(sad)[1].',
+               '[Ⅰ] 어떤 일이 뜻대로 되어 ‘%s’와 같이 느끼다.']
+CONJUGATIONS = ['가', '와', '워', '해', '러', '져', '라', '여']
+
+
+def word(rand : random.Random) -> str:
+  """Return a representation form with the marks of the dictionary (^, [/], (), homonym numbers)"""
+  stem = ''.join(rand.choice(SYLLABLES) for _ in range(rand.randint(1, 3)))
+  r = rand.random()
+  if r < 0.1:
+    stem = stem + '^' + rand.choice(SYLLABLES) + '다'
+  elif r < 0.2:
+    stem = stem + '[가/나]다'
+  elif r < 0.3:
+    stem = stem + '(을) 먹다'
+  else:
+    stem = stem + '다'
+  return stem + ('%02d' % rand.randint(1, 5) if rand.random() < 0.3 else '')
+
+
+def definition(rand : random.Random) -> str:
+  output = rand.choice(DEFINITIONS)
+  return output % word(rand) if '%s' in output else output
+
+
+def conju_info(rand : random.Random) -> List[Dict]:
+  output = list()
+  for _ in range(rand.randint(0, 2)):
+    item = {'conjugation_info' : {'conjugation' : rand.choice(CONJUGATIONS)}}
+    if rand.random() < 0.3:
+      item['abbreviation_info'] = {'abbreviation' : rand.choice(CONJUGATIONS)}
+    output.append(item)
+  return output
+
+
+def skd_dump(n : int, seed : int = 0) -> Dict:
+  """Return a json object shaped like a Standard Korean Dictionary export"""
+  rand, items = random.Random(seed), list()
+  for _ in range(n):
+    pattern = {'pattern_info' : {'pattern' : '…을'}} if rand.random() < 0.5 else dict()
+    senses = [{'definition' : definition(rand)} for _ in range(rand.randint(1, 3))]
+    info = {'word' : word(rand),
+            'word_unit' : rand.choice(['단어', '단어', '구', '관용구']),
+            'pos_info' : [{'pos' : rand.choice(['동사', '형용사', '명사', '어미', '동·형']),
+                           'comm_pattern_info' : [dict(pattern, sense_info = senses)]}]}
+    if rand.random() < 0.7:
+      info['conju_info'] = conju_info(rand)
+    items.append({'word_info' : info})
+  return {'channel' : {'total' : n, 'item' : items}}
+
+
+def okd_dump(n : int, seed : int = 0) -> Dict:
+  """Return a json object shaped like an Open Korean Dictionary export"""
+  rand, items = random.Random(seed), list()
+  for _ in range(n):
+    wordinfo = {'word' : word(rand), 'word_unit' : '어휘'}
+    if rand.random() < 0.7:
+      wordinfo['conju_info'] = conju_info(rand)
+    senseinfo = {'definition' : definition(rand), 'type' : rand.choice(['일반어', '일반어', '방언'])}
+    if rand.random() < 0.9:
+      senseinfo['pos'] = rand.choice(['동사', '형용사', '명사'])
+    items.append({'wordinfo' : wordinfo, 'senseinfo' : senseinfo})
+  return {'channel' : {'total' : n, 'item' : items}}
+
+
+NARRATION = ['그는 창밖을 한참 바라보았다.',
+             '방 안은 조용했다.',
+             '그녀는 가슴이 아파 눈물을 흘렸다.',
+             "그는 '설마' 하고 생각했다.",
+             '바람이 불어 문이 덜컹거렸다.',
+             '어머니는 기뻐서 어쩔 줄을 몰랐다.']
+DIALOGUE = ['"정말 기쁘다!"',
+            '"어디 가세요?" 하고 물었다.',
+            '"그래? 나는 몰라. 정말이야."',
+            '"\'미안하다\'는 말만 남기고 갔어요."',
+            '"그런데 말이야',
+            '그건 아니잖아."',
+            "'그래, 이제 끝이야.'"]
+
+
+def paragraphs(n : int, seed : int = 0) -> List[str]:
+  """Return dialogue-heavy paragraphs of a novel, some quotations continue to the next paragraph"""
+  rand = random.Random(seed)
+  return [' '.join(rand.choice(DIALOGUE if rand.random() < 0.6 else NARRATION) for _ in range(rand.randint(1, 6)))
+          for _ in range(n)]
+
+
+def wiki_page(chapters : int, seed : int = 0, prose : bool = False) -> str:
+  """Return an html page shaped like a novel on ko.wikisource : navigation around
+  div.mw-parser-output with headings, <p> paragraphs, <br/>, entities and notes"""
+  rand = random.Random(seed)
+  nav = ''.join('<li><a href="/wiki/%d">%s</a></li>\n' % (i, word(rand)) for i in range(300))
+  body = ['<table class="header"><tr><td>%s</td></tr></table>\n' % word(rand)]
+  for idx in range(chapters):
+    body.append('<h2><span class="mw-headline">%d</span></h2>\n' % (idx + 1))
+    for text in paragraphs(rand.randint(20, 60), seed * 1000 + idx):
+      if rand.random() < 0.1:
+        text = text.replace(' ', ' <br/>', 1)
+      if rand.random() < 0.05:
+        text += ' &amp; <i>%s</i>' % word(rand)
+      body.append(('<p class="note">%s</p>\n' if rand.random() < 0.03 else '<p>%s</p>\n') % text)
+      if rand.random() < 0.05:
+        body.append('<p><br/></p>\n')
+  content = ''.join(body)
+  if prose:
+    content = '<div class="prose">\n%s</div>\n' % content
+  return ('<html><head><title>novel</title></head><body><div id="nav"><ul>\n%s</ul></div>\n'
+          '<div id="content"><div class="mw-parser-output">\n%s</div></div></body></html>' % (nav, content))
@@ -1,14 +1,23 @@
 import sys
 import os
-import re
 from jamo import j2hcj, h2j, j2h
-from itertools import groupby
 import json
+import pickle
 import argparse
-import pandas as pd
+import tempfile
+from glob import glob
 from pathlib import Path
-from cached_property import cached_property
-from typing import List, Dict, Union, Tuple
+from functools import lru_cache, cached_property
+from typing import List, Dict, Union, Tuple, Iterable, Iterator, Optional
+from collections.abc import Mapping
+
+try:
+  import profiling
+  from utils import _import
+
+except:
+  from src.data import profiling
+  from src.data.utils import _import
 
 
 def adj_conju(item : Dict[str, str]) -> str:
@@ -42,6 +51,26 @@ def adj_conju(item : Dict[str, str]) -> str:
     return stem + '은'
   
 
+def load_word_map(path : str) -> Dict[str, List[Dict[str, str]]]:
+  """Open the dictionary saved by kordict_main.py : a folder of columns (--columnar) 
+  is memory-mapped, a SQLite database (--sqlite) is queried on demand, a jsonl file (.jsonl, .jsonl.gz, .jsonl.zst) is read line by line 
+  and grouped by the representation form, a json file (--save_as_dict) is loaded"""
+  if Path(path).is_dir():
+    return _import('kordict_store').ColumnarWordMap(path)
+
+  if Path(path).suffix in ['.sqlite', '.db']:
+    return _import('kordict_store').SqliteWordMap(path)
+
+  if '.jsonl' in Path(path).suffixes:
+    output = dict()
+    for x in _import('kordict_io').iter_jsonl(path):
+      output.setdefault(x['repr'], list()).append(x)
+    return output
+  
+  with open(Path(path), 'r', encoding = 'utf-8') as f:
+    return json.load(f)
+
+
 def add_conjugation(verb : str, conju : str):
   stem, output = verb[:-1], list()
   jamo = j2hcj(h2j(stem))
@@ -54,34 +83,154 @@ def add_conjugation(verb : str, conju : str):
 
   return output
 
+
+POS_GROUPS = {'verb' : ['동사', '형용사'], 'noun' : ['명사'], 'suffix' : ['어미', '접사']}
+
+
+def bundle_path(path : str) -> Path:
+  """Return the path of the bundle saved alongside a dictionary (e.g. korean_dataset.json.bundle.pkl)"""
+  return Path(str(path).rstrip('/') + '.bundle.pkl')
+
+
+def source_stamp(path : str) -> List[int]:
+  """Return the size and modification time of a dictionary to tell whether a bundle is stale"""
+  stat = (Path(path) / 'meta.json' if Path(path).is_dir() else Path(path)).stat()
+  return [stat.st_size, stat.st_mtime_ns]
+
+
+class SubMap(Mapping):
+  """The entries of some words of a word map, keeping only the words (e.g. the verb map loaded from a bundle)"""
+  def __init__(self, word_map : Dict[str, List[Dict[str, str]]], words : Iterable[str]):
+    self.word_map, self.words = word_map, dict.fromkeys(words)
+
+  def __getitem__(self, key : str) -> List[Dict[str, str]]:
+    if key not in self.words:
+      raise KeyError(key)
+    return self.word_map[key]
+
+  def __contains__(self, key) -> bool:
+    return key in self.words
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self.words)
+
+  def __len__(self) -> int:
+    return len(self.words)
+
+
 class FindConjugation:
-  def __init__(self, word_map : Dict[str, List[Dict[str, str]]]):
+  """If bundle (made by to_bundle) is given, the words of the maps and the derived indexes are taken from it
+  instead of being computed again
+
+  Attributes:
+    word_map : the dictionary the maps are made from
+    maps : the verb, noun and suffix dictionaries, see POS_GROUPS. Those of a store with views 
+           (kordict_store.SqliteWordMap) are queried on demand instead of copied
+    stored : whether find queries the verbs by the last syllable of the stem from the store, 
+             keeping the indexes of syllable_cache syllables, instead of indexing every verb
+  """
+  derived = ['conju_data', 'last_syl_index', 'vowel_index', 'short_cut']
+  bundle_version = 1
+  syllable_cache = 1 << 12
+
+  def __init__(self, 
+               word_map : Dict[str, List[Dict[str, str]]],
+               bundle : Optional[Dict] = None):
     self.word_map = word_map
-    self.verb_map = self._get_map(['동사', '형용사'])
+    self.stored = bundle == None and hasattr(word_map, 'view')
+    if bundle == None:
+      self.maps = self._partition()
+    else:
+      self.maps = {name : SubMap(word_map, bundle[name + '_map']) for name in POS_GROUPS.keys()}
+      self.__dict__.update({name : bundle[name] for name in self.derived}) #fill the cached properties
+    self.verb_map = self.maps['verb']
+    self._syllable_indexes = lru_cache(maxsize = self.syllable_cache)(self._query_indexes)
+
+  def _partition(self) -> Dict[str, Dict[str, List[Dict[str, str]]]]:
+    """Return the dictionaries of POS_GROUPS in one pass over word_map"""
+    if self.stored:
+      return {name : self.word_map.view(pos_list, '일반어') for name, pos_list in POS_GROUPS.items()}
+
+    if hasattr(self.word_map, 'select'):
+      return {name : self._get_map(pos_list) for name, pos_list in POS_GROUPS.items()}
+
+    group = {pos : name for name, pos_list in POS_GROUPS.items() for pos in pos_list}
+    output = {name : dict() for name in POS_GROUPS.keys()}
+    for k, v in self.word_map.items():
+      for name in set(group[x['pos']] for x in v if x['pos'] in group.keys() and x['word_type'] == '일반어'):
+        output[name][k] = v
+    return output
 
   def _get_map(self, pos_list):
     """Return the verb dictionary sorted by the word representation form"""
+    if hasattr(self.word_map, 'select'): #only the needed columns are scanned
+      return self.word_map.select(pos_list, '일반어')
+      
     return {k : v for k, v in self.word_map.items() if len(
         list(filter(lambda x : x['pos'] in pos_list and x['word_type'] == '일반어', v))
         ) > 0}
 
-  @cached_property
-  def conju_data(self):
-    """Return the dictionary of word representation and its conjugation"""
+  @staticmethod
+  def _conju_data(verb_map) -> Dict[str, List[str]]:
     conju_data = {k[:-1]: set(
         [x['conjugation'] for x in v if len(x['conjugation']) > 0 and k[:-1] not in x['conjugation']]
-        ) for k, v in self.verb_map.items()}
+        ) for k, v in verb_map.items()}
     output = dict(filter(lambda x : len(x[-1]) > 0, conju_data.items()))
     return {k : [x[-1] if len(x) == len(k) else x[-2:] for x in v] for k,v in output.items()}
+
+  @staticmethod
+  def _last_syl_index(conju_data) -> Dict[str, set]:
+    output = dict()
+    for k, v in conju_data.items():
+      output.setdefault(k[-1], set()).update(v)
+    return output
+
+  @staticmethod
+  def _vowel_index(conju_data) -> Dict[Tuple[str, bool], set]:
+    vowel_batch = _import('hangul').vowel_batch
+    output, targets = dict(), [k for k in conju_data.keys() if len(k) > 1]
+    for k, bright in zip(targets, vowel_batch([k[-2] for k in targets])):
+      output.setdefault((k[-1], bool(bright)), set()).update(conju_data[k])
+    return output
+
+  @staticmethod
+  def _short_cut(last_syl_index) -> Dict[str, set]:
+    return dict(filter(lambda x : len(x[-1]) == 1, last_syl_index.items()))
+
+  @cached_property
+  def conju_data(self):
+    """Return the dictionary of word representation and its conjugation"""
+    return self._conju_data(self.verb_map)
+  
+  @cached_property
+  def last_syl_index(self):
+    """Return the dictionary of the last syllable of stems and all their conjugation forms"""
+    return self._last_syl_index(self.conju_data)
+
+  @cached_property
+  def vowel_index(self):
+    """Return the dictionary of the last syllable of stems with whether the syllable before it 
+    is yang-sung(bright) vowel, and their conjugation forms"""
+    return self._vowel_index(self.conju_data)
   
   @cached_property
   def short_cut(self):
     """Return the dictionary of the last syllable of word and its conjuation form 
     only if their pattern is uniform"""
-    output = {k : set(sum([x[-1] for x in g],[])) for k, g in 
-              groupby(sorted(self.conju_data.items(), key = lambda x : x[0][-1]), 
-                      key = lambda x : x[0][-1])}
-    return dict(filter(lambda x : len(x[-1]) == 1, output.items()))
+    return self._short_cut(self.last_syl_index)
+
+  def _query_indexes(self, last_syl : str) -> Tuple[Dict, Dict, Dict]:
+    """Return short_cut, last_syl_index and vowel_index of the verbs whose stem ends with last_syl,
+    queried with the last_syl index of the store"""
+    conju_data = self._conju_data(self.word_map.select(POS_GROUPS['verb'], '일반어', last_syl, ['conjugation']))
+    last_syl_index = self._last_syl_index(conju_data)
+    return self._short_cut(last_syl_index), last_syl_index, self._vowel_index(conju_data)
+
+  def indexes(self, last_syl : str) -> Tuple[Dict, Dict, Dict]:
+    """Return short_cut, last_syl_index and vowel_index, of the verbs ending with last_syl only if stored"""
+    if self.stored:
+      return self._syllable_indexes(last_syl)
+    return self.short_cut, self.last_syl_index, self.vowel_index
 
   def vowel(self, word : str) -> bool:
     """Return whether the word is yang-sung(bright) vowel"""
@@ -89,34 +238,77 @@ class FindConjugation:
     vowel = jamo[1] if len(jamo) > 2 else jamo[-1]
     return True if vowel in 'ㅏㅗㅑㅛㅐㅚㅘㅒ' else False
 
+  @profiling.instrument('FindConjugation.find')
   def find(self, word : str) -> str:
     """Return the '어(-Eo)'conjugation form of a word"""
     stem = word[:-1]
-    if stem[-1] in self.short_cut.keys():
-      conju_set = self.short_cut[stem[-1]]
+    short_cut, last_syl_index, vowel_index = self.indexes(stem[-1])
+    if stem[-1] in short_cut.keys():
+      conju_set = short_cut[stem[-1]]
     
     else:
-      last_syl = dict(filter(lambda x : stem[-1] == x[0][-1], self.conju_data.items()))
-      conju_set = set(sum(list(last_syl.values()), []))
+      conju_set = last_syl_index.get(stem[-1], set())
       
       if len(stem) > 1:
-        targets = dict(filter(lambda x : len(x[0]) > 1, last_syl.items()))
-        one_half = sum([v for k,v in targets.items() if self.vowel(stem[-2]) == self.vowel(k[-2])], [])
-        conju_set = set(one_half) if len(one_half) > 0 else conju_set
+        one_half = vowel_index.get((stem[-1], self.vowel(stem[-2])), set())
+        conju_set = one_half if len(one_half) > 0 else conju_set
         
     return word[:-2] + list(conju_set)[0] if len(conju_set) == 1 else word
+
+  def to_bundle(self) -> Dict:
+    """Return the words of the maps and the derived indexes, which can be pickled"""
+    output = {name + '_map' : list(self.maps[name].keys()) for name in POS_GROUPS.keys()}
+    output.update({name : getattr(self, name) for name in self.derived})
+    return output
+
+  def save_bundle(self, path : str, source : Optional[str] = None):
+    """Save the bundle with the stamp of the source dictionary"""
+    data = {'version' : self.bundle_version, 
+            'stamp' : source_stamp(source) if source != None else None, 
+            'bundle' : self.to_bundle()}
+    #a temporary file of its own, as workers opening the same dictionary may save the bundle at once
+    with tempfile.NamedTemporaryFile(dir = Path(path).parent, prefix = Path(path).name + '.', suffix = '.tmp', delete = False) as f:
+      pickle.dump(data, f, protocol = pickle.HIGHEST_PROTOCOL)
+    os.chmod(f.name, 0o644) #readable by other users as a file made by open, not only the owner
+    os.replace(f.name, path)
+
+  @classmethod
+  def load_bundle(cls, path : str, source : Optional[str] = None) -> Optional[Dict]:
+    """Return the saved bundle, None if there is not or it is older than the source dictionary"""
+    if not Path(path).exists():
+      return None
+    with open(path, 'rb') as f:
+      data = pickle.load(f)
+    if data['version'] != cls.bundle_version or (source != None and data['stamp'] != source_stamp(source)):
+      return None
+    return data['bundle']
   
   
 class SearchPattern(FindConjugation):
-  def __init__(self, data):
-    super().__init__(data)
-    self.noun_map = self._get_map(['명사'])
-    self.suffix_map = self._get_map(['어미', '접사'])
+  """Attributes:
+    cache_size : the maximum number of conjugations and patterns kept in the LRU caches of get_patterns
+  """
+  def __init__(self, data, cache_size : int = 1 << 16, bundle : Optional[Dict] = None):
+    super().__init__(data, bundle)
+    self.noun_map, self.suffix_map = self.maps['noun'], self.maps['suffix']
+    self.find = lru_cache(maxsize = cache_size)(self.find) #per verb, shared by get_pattern
+    self._cached_pattern = lru_cache(maxsize = cache_size)(self.get_pattern)
+    
+  def _split_josa(self, word : str) -> List[List[str]]:
+    """Return the splits of the word whose second part starts with (이)다, the longest first part first.
+    Only the positions of '다' are visited instead of every split"""
+    output, idx = list(), word.rfind('다')
+    while idx >= 1:
+      output.append([word[:idx], word[idx:]])
+      if idx >= 2 and word[idx-1] == '이':
+        output.append([word[:idx-1], word[idx-1:]])
+      idx = word.rfind('다', 0, idx)
+    return output
     
+  @profiling.instrument('SearchPattern._revise_unknown')
   def _revise_unknown(self, word):
     """Split unknown word into stems"""
-    splited = [[word[:i], word[i:]] for i in range(len(word)-1, 0, -1)]
-    filtered = [x for x in splited if x[0]in self.noun_map.keys() and re.match('이?다', x[-1])]
+    filtered = [x for x in self._split_josa(word) if x[0] in self.noun_map]
     with_suffix = list(filter(lambda x: x[-1] in self.suffix_map.keys(), filtered))
     with_verb = list(filter(lambda x: x[-1] in self.verb_map.keys(), filtered))
     if len(with_suffix) > 0:
@@ -151,24 +343,54 @@ class SearchPattern(FindConjugation):
       output += add_conjugation(word, conju)
       return {'type' : 'verb', 'search_pattern' : list(set(output))}
 
+  def get_patterns(self, words : Iterable[str]) -> List[Dict[str, Union[str, Tuple[str]]]]:
+    """Return the patterns of the words in the input order, computing each word once.
+    The same word shares the same (cached) output, so do not modify them in place"""
+    words = list(words)
+    patterns = {w : self._cached_pattern(w) for w in dict.fromkeys(words)}
+    return [patterns[w] for w in words]
 
-if __name__  == '__main__':
-  sys.path.append(os.getcwd())
-  
-  parser = argparse.ArgumentParser()
-  parser.add_argument("--kordata_dir", type=str)
-  parser.add_argument("--corpus_dir", type=str)
-  parser.add_argument("--save_dir", type=str)
-  
-  args = parser.parse_args()
+  def cache_info(self) -> Dict[str, Dict[str, float]]:
+    """Return the hits, misses, size and hit rate of the conjugation and pattern caches"""
+    output = dict()
+    for name, func in [('find', self.find), ('get_pattern', self._cached_pattern)]:
+      info = func.cache_info()
+      total = info.hits + info.misses
+      output[name] = dict(info._asdict(), hit_rate = info.hits / total if total > 0 else 0.0)
+    return output
+
+
+def load_search_pattern(path : str, cache_size : int = 1 << 16, use_bundle : bool = True) -> SearchPattern:
+  """Open a dictionary (see load_word_map) with the bundle saved alongside it (bundle_path), 
+  which is built and saved first if it is missing or stale. A SQLite database is queried directly
+  and needs no bundle"""
+  word_map = load_word_map(path)
+  if use_bundle == False or hasattr(word_map, 'view'):
+    return SearchPattern(word_map, cache_size)
+
+  bundle = SearchPattern.load_bundle(bundle_path(path), path)
+  output = SearchPattern(word_map, cache_size, bundle)
+  if bundle == None:
+    output.save_bundle(bundle_path(path), path)
+  return output
+
+
+def lexicon_paths(path : str) -> List[Path]:
+  """Return the lexicon csv files of a file, a folder (searched recursively) or a glob pattern"""
+  if Path(path).is_dir():
+    return sorted(Path(path).glob('**/*.csv'))
   
-  corpus_data = pd.read_csv(Path(args.corpus_dir))
-  with open(Path(args.kordata_dir), 'r') as f:
-    kor_data = json.load(f, encoding = 'utf-8')
+  elif any(x in path for x in '*?['):
+    return sorted(Path(x) for x in glob(path, recursive = True))
+  return [Path(path)]
+
 
-  search_pattern = SearchPattern(kor_data)
-  conju_data = list(map(search_pattern.get_pattern, corpus_data['word']))
-  corpus_df = pd.DataFrame(conju_data)
+def make_corpus(corpus_data, patterns : Dict[str, Dict[str, Union[str, Tuple[str]]]]) -> List[Dict]:
+  """Return the records of a lexicon (a DataFrame with the word column) with their search patterns
+  and emotions, read from one of the layouts : ekman, emotion_1..3, emotion (a/b) or none (no emotion)"""
+  import pandas as pd
+  corpus_data = corpus_data[[type(x) == str for x in corpus_data['word']]].reset_index(drop = True) #skip empty rows
+  corpus_df = pd.DataFrame([patterns[x] for x in corpus_data['word']])
   corpus_df['word'] = corpus_data['word']
 
   if 'ekman' in corpus_data.columns:
@@ -182,11 +404,49 @@ if __name__  == '__main__':
     
   elif 'emotion' in corpus_data.columns:
     corpus_df['emotion'] = [x.split('/') for x in corpus_data['emotion']]
+
+  else:
+    corpus_df['emotion'] = [list() for _ in range(len(corpus_df))]
     
   corpus_df = corpus_df[corpus_df['emotion'] != 'None']
   corpus_df['emotion'] = [[x] if type(x) == str else x for x in corpus_df['emotion']]
-  corpus_data = corpus_df.to_dict('records')
+  return corpus_df.to_dict('records')
+
+
+if __name__  == '__main__':
+  import pandas as pd
+  sys.path.append(os.getcwd())
+  
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--kordata_dir", type=str)
+  parser.add_argument("--corpus_dir", type=str, help = 'A lexicon csv file, a folder of them or a glob pattern (e.g. "data/**/*.csv")')
+  parser.add_argument("--save_dir", type=str, default = './')
+  parser.add_argument("--bundle", 
+                      action = 'store_true', 
+                      help = 'Load the verb/noun/suffix maps and conjugation indexes from <kordata_dir>.bundle.pkl, made first if missing or stale')
+  parser.add_argument("--profile", 
+                      type=str, 
+                      default = os.environ.get(profiling.ENV, ''), 
+                      help = 'Record the calls and time of the hot paths and save them in this json file')
   
-  fname = 'corpus_' + str(Path(args.corpus_dir).parts[-1]).replace('.csv', '.jsonl')                 
-  with open(fname, "w", encoding="utf-8") as f:
-    f.write(json.dumps(corpus_data, ensure_ascii=False) + "\n")
+  args = parser.parse_args()
+  if args.profile != '':
+    profiling.enable(args.profile)
+  
+  lexicons = {path : pd.read_csv(path) for path in lexicon_paths(args.corpus_dir)}
+  search_pattern = load_search_pattern(args.kordata_dir, use_bundle = args.bundle)
+  words = list(dict.fromkeys(x for corpus_data in lexicons.values() for x in corpus_data['word'] if type(x) == str))
+  patterns = dict(zip(words, search_pattern.get_patterns(words))) #the words shared by the lexicons once
+  
+  Path(args.save_dir).mkdir(parents = True, exist_ok = True)
+  for path, corpus_data in lexicons.items():
+    corpus_data = make_corpus(corpus_data, patterns)
+    fname = 'corpus_' + str(path.parts[-1]).replace('.csv', '.jsonl')                 
+    with open(Path(args.save_dir) / fname, "w", encoding="utf-8") as f:
+      f.write(json.dumps(corpus_data, ensure_ascii=False) + "\n")
+    print('%s : %d words' % (fname, len(corpus_data)))
+  print('%d lexicons, %d unique words' % (len(lexicons), len(words)))
+
+  if profiling.enabled():
+    print(profiling.report())
+    profiling.dump(args.profile)
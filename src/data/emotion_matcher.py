@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Iterable, Iterator, Tuple
+
+
+class AhoCorasick:
+  """Find all the occurrences of many strings in one scan of a text
+
+  Attributes:
+    patterns : the unique non-empty patterns, the index is the pattern id
+    goto, fail, out : the transitions, failure links and pattern ids ending at each state
+  """
+  def __init__(self, patterns : Iterable[str]):
+    self.patterns = [x for x in dict.fromkeys(patterns) if len(x) > 0]
+    self.goto, self.fail, self.out = [dict()], [0], [list()]
+    for idx, pattern in enumerate(self.patterns):
+      self._add(pattern, idx)
+    self._link()
+
+  def _add(self, pattern : str, idx : int):
+    state = 0
+    for ch in pattern:
+      if ch not in self.goto[state]:
+        self.goto.append(dict())
+        self.fail.append(0)
+        self.out.append(list())
+        self.goto[state][ch] = len(self.goto) - 1
+      state = self.goto[state][ch]
+    self.out[state].append(idx)
+
+  def _link(self):
+    """Set the failure links breadth-first and merge the outputs of the linked states"""
+    queue = deque(self.goto[0].values())
+    while len(queue) > 0:
+      state = queue.popleft()
+      for ch, next in self.goto[state].items():
+        queue.append(next)
+        link = self.fail[state]
+        while link > 0 and ch not in self.goto[link]:
+          link = self.fail[link]
+        self.fail[next] = self.goto[link].get(ch, 0)
+        self.out[next] = self.out[next] + self.out[self.fail[next]]
+
+  def finditer(self, text : str) -> Iterator[Tuple[int, int, int]]:
+    """Yield (start, end, pattern id) of every occurrence"""
+    goto, fail, out, patterns, state = self.goto, self.fail, self.out, self.patterns, 0
+    for idx, ch in enumerate(text):
+      while state > 0 and ch not in goto[state]:
+        state = fail[state]
+      state = goto[state].get(ch, 0)
+      for pid in out[state]:
+        yield idx + 1 - len(patterns[pid]), idx + 1, pid
+
+
+class EmotionMatcher:
+  """Match the search patterns made by corpus_utils.SearchPattern against sentences.
+  All the patterns are compiled into one automaton, so each sentence is scanned once.
+
+  Attributes:
+    entries : the records of a corpus_*.jsonl file (type, search_pattern, word, emotion)
+    max_gap : the maximum number of characters between the noun and the verb of a phrase
+  """
+  def __init__(self, entries : List[Dict], max_gap : int = 10):
+    self.entries, self.max_gap = entries, max_gap
+    self.roles = dict() #pattern -> [(role, entry index)], role : 'verb', 'noun' or 'phrase_verb'
+    for idx, entry in enumerate(entries):
+      for role, pattern in self._patterns(entry):
+        self.roles.setdefault(pattern, list()).append((role, idx))
+    self.automaton = AhoCorasick(self.roles.keys())
+
+  @classmethod
+  def from_file(cls, path : str, max_gap : int = 10):
+    """Read a corpus_*.jsonl file, either one list of records or one record per line"""
+    entries = list()
+    with open(path, 'r', encoding = 'utf-8') as f:
+      for line in f:
+        if len(line.strip()) > 0:
+          data = json.loads(line)
+          entries += data if type(data) == list else [data]
+    return cls(entries, max_gap)
+
+  def _patterns(self, entry : Dict) -> List[Tuple[str, str]]:
+    pattern = entry['search_pattern']
+    if entry['type'] == 'phrase':
+      noun, verbs = pattern
+      return [('noun', noun)] + [('phrase_verb', x) for x in verbs]
+
+    elif entry['type'] == 'verb':
+      return [('verb', x) for x in pattern]
+
+    else:
+      return [('verb', pattern)]
+
+  def scan(self, sentence : str, sentence_id = None) -> List[Dict]:
+    """Return the hits (sentence id, span, word, emotion) in a sentence"""
+    found, nouns, verbs = dict(), dict(), dict()
+    for start, end, pid in self.automaton.finditer(sentence):
+      for role, idx in self.roles[self.automaton.patterns[pid]]:
+        if role == 'verb':
+          found[(idx, start, end)] = None
+        elif role == 'noun':
+          nouns.setdefault(idx, list()).append((start, end))
+        else:
+          verbs.setdefault(idx, list()).append((start, end))
+
+    for idx, spans in nouns.items(): #a noun followed by one of its verb forms within max_gap
+      for start, end in spans:
+        after = [v for v in verbs.get(idx, list()) if end <= v[0] <= end + self.max_gap]
+        if len(after) > 0:
+          found[(idx, start, min(after)[1])] = None
+
+    return [{'sentence_id' : sentence_id,
+             'span' : [start, end],
+             'word' : self.entries[idx]['word'],
+             'emotion' : self.entries[idx]['emotion'] if 'emotion' in self.entries[idx].keys() else list()}
+            for idx, start, end in sorted(found.keys(), key = lambda x : (x[1], x[2], x[0]))]
+
+  def scan_all(self, sentences : Iterable[str]) -> Iterator[Dict]:
+    for sentence_id, sentence in enumerate(sentences):
+      yield from self.scan(sentence, sentence_id)
+
+
+if __name__ == '__main__':
+  sys.path.append(os.getcwd())
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--pattern_dir", type=str, help = 'A corpus_*.jsonl file written by corpus_utils.py')
+  parser.add_argument("--text_dir", type=str, help = 'A text file with one sentence per line')
+  parser.add_argument("--save_dir", type=str, default = './')
+  parser.add_argument("--max_gap", type=int, default = 10)
+  args = parser.parse_args()
+
+  matcher = EmotionMatcher.from_file(args.pattern_dir, args.max_gap)
+  with open(args.text_dir, 'r', encoding = 'utf-8') as f:
+    sentences = [x.rstrip('\n') for x in f]
+
+  start, n_hits = time.perf_counter(), 0
+  fname = 'hits_' + Path(args.text_dir).stem + '.jsonl'
+  with open(Path(args.save_dir) / fname, 'w', encoding = 'utf-8') as f:
+    for hit in matcher.scan_all(sentences):
+      f.write(json.dumps(hit, ensure_ascii = False) + '\n')
+      n_hits += 1
+
+  elapsed = time.perf_counter() - start
+  n_chars = sum(map(len, sentences))
+  print('%d sentences, %d hits, %.0f chars/sec' % (len(sentences), n_hits, n_chars / elapsed))
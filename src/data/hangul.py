@@ -0,0 +1,95 @@
+"""Decompose and compose Hangul syllables (U+AC00 - U+D7A3) arithmetically on arrays of code points
+
+  code = 0xAC00 + (lead * 21 + vowel) * 28 + final
+"""
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+
+BASE, LAST = 0xAC00, 0xD7A3
+N_VOWEL, N_FINAL = 21, 28
+VOWELS = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+FINALS = ['', 'ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄹ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ',
+          'ㄿ', 'ㅀ', 'ㅁ', 'ㅂ', 'ㅄ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+NIEUN, RIEUL, BIEUP, SIOT, HIEUH = [FINALS.index(x) for x in 'ㄴㄹㅂㅅㅎ']
+BRIGHT = np.array([x in 'ㅏㅗㅑㅛㅐㅚㅘㅒ' for x in VOWELS]) #same as FindConjugation.vowel
+SUFFIX = ['', '는', '은', '운']
+
+try:
+  from utils import _import
+
+except:
+  from src.data.utils import _import
+
+
+def to_codes(chars : Sequence[str]) -> np.ndarray:
+  """Return the code points of single characters"""
+  return np.frombuffer(''.join(chars).encode('utf-32-le'), dtype = '<u4').astype(np.int64)
+
+
+def to_chars(codes : np.ndarray) -> str:
+  """Return the characters of the code points as a string"""
+  return np.asarray(codes, dtype = '<u4').tobytes().decode('utf-32-le')
+
+
+def is_syllable(codes : np.ndarray) -> np.ndarray:
+  return (codes >= BASE) & (codes <= LAST)
+
+
+def decompose(codes : np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """Return the indices of the lead consonant, vowel and final consonant (0 if none) of syllables"""
+  offset = codes - BASE
+  return offset // (N_VOWEL * N_FINAL), (offset // N_FINAL) % N_VOWEL, offset % N_FINAL
+
+
+def compose(lead : np.ndarray, vowel : np.ndarray, final : np.ndarray) -> np.ndarray:
+  return BASE + (lead * N_VOWEL + vowel) * N_FINAL + final
+
+
+def vowel_batch(chars : Sequence[str]) -> np.ndarray:
+  """Return whether each character is yang-sung(bright) vowel, the batch version of FindConjugation.vowel"""
+  codes = to_codes(chars)
+  syllable = is_syllable(codes)
+  output = np.zeros(len(codes), dtype = bool)
+  output[syllable] = BRIGHT[decompose(codes[syllable])[1]]
+
+  if not syllable.all(): #jamo or other characters
+    from jamo import h2j, j2hcj
+    for idx in np.nonzero(~syllable)[0]:
+      output[idx] = j2hcj(h2j(chars[idx]))[-1] in 'ㅏㅗㅑㅛㅐㅚㅘㅒ'
+  return output
+
+
+def adj_conju_batch(items : List[Dict[str, str]]) -> List[str]:
+  """Return the adjective transformative forms of the words, the batch version of corpus_utils.adj_conju"""
+  stems = [x['repr'][:-1] for x in items]
+  valid = np.array([len(x) > 0 for x in stems])
+  codes = to_codes([x[-1] if len(x) > 0 else ' ' for x in stems])
+  lead, vowel, final = decompose(codes)
+  no_final, with_nieun = compose(lead, vowel, 0), compose(lead, vowel, NIEUN)
+
+  last = np.array([x[-1] if len(x) > 0 else '' for x in stems])
+  verb = np.isin(last, ['있', '없']) | np.array(['동사' in x['pos'] for x in items])
+  gop = np.isin(last, ['곱', '굽']) & np.array([x['conjugation'] != '' for x in items])
+  fallback = ~valid | ~is_syllable(codes) | (~verb & gop)
+
+  conditions = [verb,
+                (final == 0) | (final == RIEUL),
+                (final == HIEUH) & (last != '좋'),
+                final == SIOT,
+                (final == BIEUP) & ~np.isin(last, ['업', '잡', '접', '좁', '줍'])]
+  syllables = np.select(conditions,
+                        [np.where(final == RIEUL, no_final, codes),
+                         with_nieun,
+                         with_nieun,
+                         np.where(np.isin(last, ['짓', '잇', '젓', '낫', '붓']), no_final, codes),
+                         np.where(last == '웁', ord('운'), no_final)],
+                        codes)
+  suffixes = np.select(conditions, [1, 0, 0, 2, np.where(last == '웁', 0, 3)], 2)
+
+  chars = to_chars(np.where(fallback, ord(' '), syllables)) #the codes of the fallback rows may not be characters
+  output = [stem[:-1] + chars[idx] + SUFFIX[suffixes[idx]] for idx, stem in enumerate(stems)]
+  if fallback.any():
+    adj_conju = _import('corpus_utils').adj_conju
+    for idx in np.nonzero(fallback)[0]:
+      output[idx] = adj_conju(items[idx])
+  return output
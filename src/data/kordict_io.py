@@ -0,0 +1,216 @@
+"""Write and read the dictionary entries with a bounded memory"""
+import io
+import os
+import sys
+import gzip
+import json
+import heapq
+import tempfile
+from pathlib import Path
+from itertools import groupby
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+from attrs import asdict
+
+try:
+  import orjson
+
+except ImportError:
+  orjson = None
+
+
+class ExternalSorter:
+  """Sort and deduplicate lines which do not fit in memory : the lines are kept until
+  they exceed memory_budget, then sorted and spilled to a run file in tmp_dir.
+  The runs are merged lazily, max_files at a time.
+
+    with ExternalSorter(64 << 20) as sorter:
+      for line in lines:
+        sorter.add(line)
+      for line in sorter.merged():
+        ...
+  """
+  def __init__(self,
+               memory_budget : int = 256 << 20,
+               tmp_dir : Optional[str] = None,
+               max_files : int = 64):
+    self.memory_budget, self.max_files = memory_budget, max_files
+    self.tmp = tempfile.TemporaryDirectory(dir = tmp_dir, prefix = 'kordict_sort_')
+    self.buffer, self.size, self.runs = list(), 0, list()
+
+  def add(self, line : str):
+    """Add a line without a line break"""
+    self.buffer.append(line)
+    self.size += sys.getsizeof(line) + 8 #the string and its pointer in the list
+    if self.size >= self.memory_budget:
+      self._spill()
+
+  def _spill(self):
+    if len(self.buffer) == 0:
+      return
+    self.buffer.sort()
+    self.runs.append(self._write(dict.fromkeys(self.buffer))) #dedup inside the run keeping the order
+    self.buffer, self.size = list(), 0
+
+  def _write(self, lines : Iterable[str]) -> Path:
+    path = Path(self.tmp.name) / ('run_%06d' % len(os.listdir(self.tmp.name)))
+    with open(path, 'w', encoding = 'utf-8') as f:
+      f.writelines(line + '\n' for line in lines)
+    return path
+
+  def _merge(self, runs : List[Path]) -> Iterator[str]:
+    files = [open(x, 'r', encoding = 'utf-8') for x in runs]
+    try:
+      previous = None
+      for line in heapq.merge(*files):
+        if line != previous:
+          yield line.rstrip('\n')
+        previous = line
+    finally:
+      for f in files:
+        f.close()
+
+  def merged(self) -> Iterator[str]:
+    """Yield the unique lines in order"""
+    if len(self.runs) == 0: #everything fits in memory
+      self.buffer.sort()
+      yield from dict.fromkeys(self.buffer)
+      return
+
+    self._spill()
+    runs = self.runs
+    while len(runs) > self.max_files: #not to open too many files at once
+      runs = [self._write(self._merge(runs[i:i + self.max_files])) for i in range(0, len(runs), self.max_files)]
+    yield from self._merge(runs)
+
+  def close(self):
+    self.buffer, self.runs = list(), list()
+    self.tmp.cleanup()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def to_sort_line(entry) -> str:
+  """Return '<escaped repr>\\t<entry as json>'. json escapes the characters below ' ',
+  so the tab is smaller than any character of the key and the lines sort by the representation form first"""
+  record = entry if type(entry) == dict else asdict(entry)
+  return json.dumps(record['repr'], ensure_ascii = False)[1:-1] + '\t' + json.dumps(record, ensure_ascii = False)
+
+
+def write_grouped(lines : Iterable[str], f : TextIO) -> int:
+  """Write the sorted lines of to_sort_line as one json object of the representation form and its entries,
+  formatted as json.dump(..., ensure_ascii = False) does, and return the number of keys"""
+  f.write('{')
+  n_keys = 0
+  for key, group in groupby(lines, key = lambda x : x[:x.index('\t')]):
+    f.write((', ' if n_keys > 0 else '') + '"' + key + '": [')
+    f.write(', '.join(x[len(key) + 1:] for x in group))
+    f.write(']')
+    n_keys += 1
+  f.write('}')
+  return n_keys
+
+
+def save_dict_external(entries : Iterable,
+                       path : Union[str, Path],
+                       memory_budget : int = 256 << 20,
+                       tmp_dir : Optional[str] = None) -> int:
+  """Save the entries (Wordinfo or dict) as korean_dataset.json (--save_as_dict) without duplicates,
+  keeping at most about memory_budget bytes of them in memory (the budget does not cover how the entries are produced, 
+  see kordict_main.iter_entries). The keys are sorted as --save_as_dict does,
+  except for the representation forms with quotes, backslashes or control characters (sorted as escaped).
+  Return the number of keys"""
+  with ExternalSorter(memory_budget, tmp_dir) as sorter:
+    for x in entries:
+      sorter.add(to_sort_line(x))
+    with open(path, 'w', encoding = 'utf-8') as f:
+      return write_grouped(sorter.merged(), f)
+
+
+def _open_binary(path : Union[str, Path], mode : str, level : Optional[int] = None) -> BinaryIO:
+  """Open a file for 'rb' or 'wb', compressed by its suffix : .gz (gzip) or .zst (zstandard, if installed)"""
+  suffix = Path(path).suffix
+  if suffix == '.gz':
+    return gzip.open(path, mode, compresslevel = 6 if level == None else level)
+  
+  elif suffix == '.zst':
+    try:
+      import zstandard
+    except ImportError:
+      raise ImportError('%s needs the zstandard package (pip install zstandard)' % path)
+    f = open(path, mode)
+    if mode == 'wb':
+      return zstandard.ZstdCompressor(level = 3 if level == None else level).stream_writer(f, closefd = True)
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, closefd = True))
+
+  return open(path, mode)
+
+
+def dumps(record : Dict[str, Any], backend : Optional[str] = None) -> bytes:
+  """Return a record as one line of utf-8 json (orjson if installed, or backend = 'json')"""
+  if orjson != None and backend != 'json':
+    return orjson.dumps(record)
+  return json.dumps(record, ensure_ascii = False).encode('utf-8')
+
+
+class JsonlWriter:
+  """Write one record (Wordinfo or dict) per line, collecting the lines in memory 
+  and writing them by buffer_size bytes. The file is compressed by its suffix (.gz, .zst).
+
+    with JsonlWriter('korean_dataset.jsonl.gz') as f:
+      f.write_all(total)
+  """
+  def __init__(self,
+               path : Union[str, Path],
+               buffer_size : int = 1 << 20,
+               level : Optional[int] = None,
+               backend : Optional[str] = None):
+    self.path, self.buffer_size, self.backend = Path(path), buffer_size, backend
+    self.f = _open_binary(self.path, 'wb', level)
+    self.chunks, self.size, self.count = list(), 0, 0
+
+  def dumps(self, record) -> bytes:
+    return dumps(record if type(record) == dict else asdict(record, recurse = False), self.backend)
+
+  def write_line(self, line : bytes):
+    """Write a line made by dumps"""
+    self.chunks.append(line)
+    self.chunks.append(b'\n')
+    self.size += len(line) + 1
+    self.count += 1
+    if self.size >= self.buffer_size:
+      self.flush()
+
+  def write(self, record):
+    self.write_line(self.dumps(record))
+
+  def write_all(self, records : Iterable) -> int:
+    for x in records:
+      self.write_line(self.dumps(x))
+    return self.count
+
+  def flush(self):
+    self.f.write(b''.join(self.chunks))
+    self.chunks, self.size = list(), 0
+
+  def close(self):
+    self.flush()
+    self.f.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def iter_jsonl(path : Union[str, Path], backend : Optional[str] = None) -> Iterator[Dict[str, Any]]:
+  """Yield the records of a (compressed) jsonl file written by JsonlWriter or kordict_main.py"""
+  loads = orjson.loads if orjson != None and backend != 'json' else json.loads
+  with _open_binary(path, 'rb') as f:
+    for line in f:
+      if len(line.strip()) > 0:
+        yield loads(line)
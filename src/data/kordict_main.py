@@ -3,38 +3,52 @@ import sys
 import argparse
 import json
 import re
+import time
+import pickle
+import hashlib
 import logging
-import numpy as np
 
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Tuple, Union, Iterator, Optional
 from pathlib import Path
-from tqdm import tqdm
-from itertools import groupby
-from attrs import define, field, asdict
+from itertools import groupby, chain
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from attrs import define, field, asdict, astuple
 
 try:
-  from utils import OLD_KOR_UNICODE
+  from utils import iter_json_array, _import
   from kordict_utils import CleanRepr, CleanDef, clean_conju, get_full_pos
+  import kordict_rx as rx
+  import profiling
 
 except:
-  from src.data.utils import OLD_KOR_UNICODE
+  from src.data.utils import iter_json_array, _import
   from src.data.kordict_utils import CleanRepr, CleanDef, clean_conju, get_full_pos
+  from src.data import kordict_rx as rx
+  from src.data import profiling
+
+
+logger = logging.getLogger(__name__)
 
   
-@define(frozen = True)
+@define(frozen = True, cache_hash = True)
 class Wordinfo:
+  """A sense of a word. The class is slotted (attrs.define) and keeps its hash once computed,
+  and the low-cardinality fields are interned so that millions of entries share their strings"""
   repr : str
   definition : str
-  pos : str
+  pos : str = field(converter = sys.intern)
   conjugation : list = field(converter = clean_conju)
-  word : str = field(converter = lambda x : re.sub('[0-9\^\_]','',x))
+  word : str = field(converter = lambda x : rx.WORD_MARKS.sub('',x))
   options : list = field(converter = lambda x : '&'.join(sorted(x)))
-  syntax : list = field(converter = lambda x : '&'.join(sorted(x)))
+  syntax : list = field(converter = lambda x : sys.intern('&'.join(sorted(x))))
   synonym : list = field(converter = lambda x : '&'.join(sorted(x)))
-  unit : str = field
-  word_type : str = field
+  unit : str = field(converter = sys.intern)
+  word_type : str = field(converter = sys.intern)
 
   @classmethod
+  @profiling.instrument('Wordinfo.update')
   def update(cls, info : Dict):
     repr, options = CleanRepr(info['word']).output
     definition, synonym = CleanDef(info['definition'],info['word']).output
@@ -53,28 +67,62 @@ class Wordinfo:
     })
     
     return cls(**info)
+
+  @classmethod
+  def restore(cls, values : Tuple[str]):
+    """Return the entry of the values of astuple, which are already converted (see ParseCache)"""
+    output = object.__new__(cls)
+    output.__setstate__(values)
+    return output
     
     
+class _OldKorPattern:
+  """The pattern of the words with old Korean characters or only jamo, compiled on the first access 
+  from the class or an instance (KordictDataset.filter stays a class attribute)"""
+  def __get__(self, obj, owner = None) -> re.Pattern:
+    return rx.OLD_KOR
+
+
 class KordictDataset:
-  filter = re.compile('.*'+'['+ ''.join(['%s-%s' % (s,e) for s,e in OLD_KOR_UNICODE]) + ']|[ㄱ-ㅎㅏ-ㅣ]+$', re.UNICODE)
+  filter = _OldKorPattern()
     
   def __init__(self, 
                path : str, 
                standard : bool = True,
-               filter_old_kor : bool = True):
+               filter_old_kor : bool = True,
+               streaming : bool = False):
+    """If streaming is True, the output is a generator of Wordinfo 
+    reading channel.item incrementally instead of a list"""
     self.path, self.standard, self.filter_old_kor = path, standard, filter_old_kor
-    self.output = self._build()
+    self.output = self._stream() if streaming == True else self._build()
   
   def _open(self, path):
     with open(path, 'r') as f:
       data = json.load(f)
     return data
+
+  def _iter_items(self, path) -> Iterator[Dict]:
+    """Yield the items of channel.item one by one"""
+    with open(path, 'r') as f:
+      yield from iter_json_array(f, 'item')
+  
+  def _parse(self, data) -> Iterator[Wordinfo]:
+    output = chain.from_iterable(map(self._standard_info, data)) if self.standard == True else map(self._our_info, data)
+    return filter(self._keep, output) if self.filter_old_kor == True else output
+
+  def _keep(self, entry : Wordinfo) -> bool:
+    """Return whether the entry passes the filter, counting the filtered ones"""
+    if self.filter.match(entry.repr):
+      profiling.count('KordictDataset.filtered')
+      return False
+    return True
     
-  def _build(self):
+  def _build(self) -> List[Wordinfo]:
     data = self._open(self.path)['channel']['item']
-    output = sum(list(map(self._standard_info, data)),[]) if self.standard == True else list(map(self._our_info, data))
-    output = list(filter(lambda x : not self.filter.match(x.repr), output)) if self.filter_old_kor == True else output
-    return output
+    return list(self._parse(data))
+
+  def _stream(self) -> Iterator[Wordinfo]:
+    return self._parse(self._iter_items(self.path))
   
   def _standard_info(self, item) -> Dict[str, Union[List[str], str]]:
     """Get word information from a json file downloaded from Standard Korean Dictionary (https://stdict.korean.go.kr/main/main.do)"""
@@ -107,6 +155,145 @@ class KordictDataset:
                             'definition' : item['senseinfo']['definition'],
                             'word_type' : item['senseinfo']['type']})
 
+
+def get_jobs(skd_dir : str = '', okd_dir : str = '') -> List[Tuple[Path, bool]]:
+  """Return the json files to parse with whether they are from Standard Korean Dictionary"""
+  jobs = list()
+  if skd_dir != '':
+    jobs += [(x, True) for x in sorted(Path(skd_dir).glob('**/*.json'))]
+  
+  if okd_dir != '':
+    jobs += [(x, False) for x in sorted(Path(okd_dir).glob('**/*.json'))]
+  return jobs
+
+
+def parse_file(job : Tuple[Path, bool]) -> Tuple[Path, List[Wordinfo], float]:
+  """Parse one json file and drop the duplicates inside it"""
+  path, standard = job
+  start = time.perf_counter()
+  output = list(set(KordictDataset(path, standard, streaming = True).output))
+  return path, output, time.perf_counter() - start
+
+
+class ParseCache:
+  """Keep the parsed entries of each json file on disk, keyed by its path and content hash.
+  The entries are saved as tuples of their fields, so that the cache does not depend on 
+  the module Wordinfo is imported from (__main__ when kordict_main.py is run as a script)
+  
+  Attributes:
+    version : the format of the cached entries, bump it when the parsing rules or Wordinfo change
+    hits, misses : the number of files found in the cache or (re)parsed
+  """
+  version = 2
+
+  def __init__(self, cache_dir : str):
+    self.cache_dir = Path(cache_dir)
+    self.cache_dir.mkdir(parents = True, exist_ok = True)
+    self.hits, self.misses, self.digests = 0, 0, dict()
+
+  def _digest(self, path : Path) -> str:
+    """Return the sha256 of the file content"""
+    output = hashlib.sha256()
+    with open(path, 'rb') as f:
+      for chunk in iter(lambda : f.read(1 << 20), b''):
+        output.update(chunk)
+    return output.hexdigest()
+
+  def _file(self, job : Tuple[Path, bool]) -> Path:
+    path, standard = job
+    key = '%s|%s|%d' % (Path(path).resolve(), standard, self.version)
+    return self.cache_dir / (hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl')
+
+  def _load(self, cached : Path) -> Optional[Dict]:
+    """Return the cached data, None if the file is broken (e.g. truncated)"""
+    try:
+      with open(cached, 'rb') as f:
+        return pickle.load(f)
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+      logger.warning('%s : broken cache file, parsed again (%r)', cached, e)
+      return None
+
+  def get(self, job : Tuple[Path, bool]) -> Optional[List[Wordinfo]]:
+    """Return the cached entries if the file has not changed since it was cached"""
+    self.digests[job] = self._digest(job[0])
+    data = self._load(self._file(job)) if self._file(job).exists() else None
+    if data != None and data['digest'] == self.digests[job]:
+      self.hits += 1
+      return [Wordinfo.restore(x) for x in data['output']]
+    
+    self.misses += 1
+    return None
+
+  def put(self, job : Tuple[Path, bool], output : List[Wordinfo]):
+    cached = self._file(job)
+    digest = self.digests[job] if job in self.digests.keys() else self._digest(job[0])
+    with open(cached.with_suffix('.tmp'), 'wb') as f:
+      pickle.dump({'digest' : digest, 'output' : [astuple(x, recurse = False) for x in output]}, f, protocol = pickle.HIGHEST_PROTOCOL)
+    os.replace(cached.with_suffix('.tmp'), cached) #not to leave a broken file when interrupted
+
+
+def map_ahead(pool : ProcessPoolExecutor, func, jobs : List, ahead : int) -> Iterator:
+  """Yield func(job) in order as pool.map does, but submit at most ahead jobs not yet yielded,
+  so that the finished results do not pile up while the caller is slower than the pool"""
+  pending = deque()
+  for job in jobs:
+    if len(pending) >= ahead:
+      yield pending.popleft().result()
+    pending.append(pool.submit(func, job))
+  while len(pending) > 0:
+    yield pending.popleft().result()
+
+
+def iter_parsed(jobs : List[Tuple[Path, bool]], 
+                workers : int = 1, 
+                cache : Optional[ParseCache] = None) -> Iterator[List[Wordinfo]]:
+  """Yield the entries of each json file without the duplicates inside it, from the cache
+  or parsed (in a process pool if workers > 1). The caller holds one file at a time,
+  and the pool at most one more per worker"""
+  from tqdm import tqdm
+  todo = list()
+  for job in jobs:
+    output = cache.get(job) if cache != None else None
+    if output == None:
+      todo.append(job)
+    else:
+      yield output
+      
+  if cache != None:
+    logger.info('cache : %d hits, %d misses', cache.hits, cache.misses)
+
+  with ProcessPoolExecutor(workers) if workers > 1 else nullcontext() as pool:
+    results = map(parse_file, todo) if pool == None else map(profiling.from_worker, map_ahead(pool, profiling.in_worker(parse_file), todo, workers))
+    for job, (path, output, elapsed) in tqdm(zip(todo, results), total = len(todo)):
+      logger.info('%s : %d entries in %.2fs', path, len(output), elapsed)
+      if cache != None:
+        cache.put(job, output)
+      yield output
+
+
+def iter_entries(jobs : List[Tuple[Path, bool]], 
+                 workers : int = 1, 
+                 cache : Optional[ParseCache] = None) -> Iterator[Wordinfo]:
+  """Yield the entries of the json files one by one, with duplicates (e.g. for save_dict_external).
+  Parsed in this process without a cache, they are streamed from the files and no file is held in memory.
+  Otherwise each file is parsed whole to be cached or sent back by a worker (see iter_parsed)"""
+  if workers > 1 or cache != None:
+    return chain.from_iterable(iter_parsed(jobs, workers, cache))
+
+  from tqdm import tqdm
+  return chain.from_iterable(KordictDataset(path, standard, streaming = True).output for path, standard in tqdm(jobs))
+
+
+def build_total(jobs : List[Tuple[Path, bool]], 
+                workers : int = 1, 
+                cache : Optional[ParseCache] = None) -> List[Wordinfo]:
+  """Parse the json files (in a process pool if workers > 1) and merge them without duplicates.
+  With a cache, only the new or changed files are parsed"""
+  total = set()
+  for output in iter_parsed(jobs, workers, cache):
+    total.update(output)
+  return list(total)
+
   
 if __name__ == '__main__':
   sys.path.append(os.getcwd())
@@ -121,27 +308,109 @@ if __name__ == '__main__':
                       help = 'The folder of json files downloaded from Our Korean Dictionary')
   parser.add_argument("--save_dir", type=str, default = './')
   parser.add_argument("--save_as_dict", type=bool, default = False)
+  parser.add_argument("--columnar", 
+                      action = 'store_true', 
+                      help = 'Save korean_dataset.col, memory-mapped columns read by kordict_store.ColumnarWordMap')
+  parser.add_argument("--sqlite", 
+                      action = 'store_true', 
+                      help = 'Save korean_dataset.sqlite, an indexed database read by kordict_store.SqliteWordMap')
+  parser.add_argument("--streaming", 
+                      action = 'store_true', 
+                      help = 'Read the json files incrementally and write korean_dataset.jsonl entry by entry. '
+                             'The entries are not kept, but a 16-byte digest of each unique one is, to drop the duplicates')
+  parser.add_argument("--workers", 
+                      type=int, 
+                      default = 1, 
+                      help = 'The number of processes parsing the json files')
+  parser.add_argument("--cache_dir", 
+                      type=str, 
+                      default = '', 
+                      help = 'The folder keeping the parsed entries of each json file to skip unchanged files')
+  parser.add_argument("--external_sort", 
+                      action = 'store_true', 
+                      help = 'With --save_as_dict, sort and deduplicate the entries on disk within --memory_budget (--columnar always does)')
+  parser.add_argument("--memory_budget", 
+                      type=int, 
+                      default = 256, 
+                      help = 'The memory (MB) for the entries kept before spilling a sorted run with --external_sort or --columnar. '
+                             'With --workers > 1 or --cache_dir, each json file is also parsed whole, so add the size of the largest parsed file per worker')
+  parser.add_argument("--tmp_dir", 
+                      type=str, 
+                      default = '', 
+                      help = 'The folder of the sorted runs of --external_sort or --columnar, the system temporary folder by default')
+  parser.add_argument("--compress", 
+                      type=str, 
+                      default = '', 
+                      choices = ['', 'gz', 'zst'],
+                      help = 'Compress korean_dataset.jsonl with gzip or zstandard (korean_dataset.jsonl.gz/.zst)')
+  parser.add_argument("--profile", 
+                      type=str, 
+                      default = os.environ.get(profiling.ENV, ''), 
+                      help = 'Record the calls and time of the hot paths and save them in this json file')
   args = parser.parse_args()
+  logging.basicConfig(level = logging.INFO, format = '%(asctime)s %(levelname)s %(message)s')
+  if args.profile != '':
+    profiling.enable(args.profile)
 
-  total = list()
-  if args.skd_dir != '':
-    for x in tqdm(Path(args.skd_dir).glob('**/*.json')):
-      total += KordictDataset(x).output
-  
-  if args.okd_dir != '':
-    for x in tqdm(Path(args.okd_dir).glob('**/*.json')):
-      total += KordictDataset(x, False).output
+  from tqdm import tqdm
+  kordict_io = _import('kordict_io')
+  JsonlWriter, save_dict_external = kordict_io.JsonlWriter, kordict_io.save_dict_external
+
+  jobs = get_jobs(args.skd_dir, args.okd_dir)
+  jsonl = Path(args.save_dir)/ ('korean_dataset.jsonl' + ('.' + args.compress if args.compress != '' else ''))
+  if args.streaming == True and args.save_as_dict == False and args.columnar == False and args.sqlite == False:
+    if args.workers > 1 or args.cache_dir != '':
+      logger.warning('--streaming parses the files one by one in this process : --workers and --cache_dir are ignored')
+    
+    seen = set() #digests of the written entries to drop duplicates
+    with JsonlWriter(jsonl) as f:
+      for path, standard in tqdm(jobs):
+        for x in KordictDataset(path, standard, streaming = True).output:
+          #the fields, not the line, which depends on the json backend
+          key = hashlib.md5(json.dumps(astuple(x, recurse = False), ensure_ascii = False).encode('utf-8')).digest()
+          if key not in seen:
+            seen.add(key)
+            f.write(x)
+
+  elif args.save_as_dict == True and args.external_sort == True:
+    start = time.perf_counter()
+    cache = ParseCache(args.cache_dir) if args.cache_dir != '' else None
+    entries = iter_entries(jobs, args.workers, cache)
+    n_keys = save_dict_external(entries, 
+                                Path(args.save_dir)/ 'korean_dataset.json', 
+                                args.memory_budget << 20, 
+                                args.tmp_dir if args.tmp_dir != '' else None)
+    logger.info('%d words from %d files in %.2fs', n_keys, len(jobs), time.perf_counter() - start)
 
-  total = list(set(total))
+  elif args.columnar == True:
+    start = time.perf_counter()
+    cache = ParseCache(args.cache_dir) if args.cache_dir != '' else None
+    _import('kordict_store').write_columnar(iter_entries(jobs, args.workers, cache), 
+                                            Path(args.save_dir) / 'korean_dataset.col', 
+                                            args.memory_budget << 20, 
+                                            args.tmp_dir if args.tmp_dir != '' else None)
+    logger.info('korean_dataset.col from %d files in %.2fs', len(jobs), time.perf_counter() - start)
+
+  else:
+    start = time.perf_counter()
+    cache = ParseCache(args.cache_dir) if args.cache_dir != '' else None
+    total = build_total(jobs, args.workers, cache)
+    logger.info('%d entries from %d files in %.2fs', len(total), len(jobs), time.perf_counter() - start)
   
-  if args.save_as_dict == True:
-    output = {k : list(map(lambda x : asdict(x), g)) for k, g in 
-              groupby(sorted(total, key = lambda x: x.repr), key = lambda x : x.repr)}
-    with open(Path(args.save_dir)/ 'korean_dataset.json', "w", encoding="utf-8") as f:
-      json.dump(output, f, ensure_ascii=False)
+    if args.save_as_dict == True:
+      output = {k : list(map(lambda x : asdict(x), g)) for k, g in 
+                groupby(sorted(total, key = lambda x: x.repr), key = lambda x : x.repr)}
+      with open(Path(args.save_dir)/ 'korean_dataset.json', "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False)
+
+
+    elif args.sqlite == True:
+      _import('kordict_store').write_sqlite(total, Path(args.save_dir) / 'korean_dataset.sqlite')
   
-  else:
-    with open(Path(args.save_dir)/ 'korean_dataset.jsonl', "w", encoding="utf-8") as f:
-      output = list(map(lambda x : asdict(x), total))
-      for i in output: 
-        f.write(json.dumps(i) + "\n")
+    else:
+      with JsonlWriter(jsonl) as f:
+        f.write_all(total)
+
+  if profiling.enabled():
+    print(profiling.report())
+    profiling.dump(args.profile)
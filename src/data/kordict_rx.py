@@ -0,0 +1,63 @@
+"""Regular expressions used to normalize dictionary entries (CleanRepr, CleanDef, Wordinfo, KordictDataset).
+Each pattern is compiled on its first use (rx.WORD_MARKS) and kept as a module attribute afterwards."""
+import re
+
+try:
+  from utils import ROMAN_NUM_UNICODE, CHINESE_UNICODE, OLD_KOR_UNICODE, CleanStr
+
+except:
+  from src.data.utils import ROMAN_NUM_UNICODE, CHINESE_UNICODE, OLD_KOR_UNICODE, CleanStr
+
+
+NUMBERS =  '[' + '0-9' + ''.join(['%s-%s' % (s,e) for s,e in ROMAN_NUM_UNICODE]) + ']'
+CHINESE_ENGLISH =  '[A-Za-z' + ''.join(['%s-%s' % (s,e) for s,e in CHINESE_UNICODE]) + ']'
+
+_SOURCES = {
+  #Wordinfo
+  'WORD_MARKS' : lambda : '[0-9\^\_]',
+
+  #KordictDataset
+  'OLD_KOR' : lambda : '.*'+'['+ ''.join(['%s-%s' % (s,e) for s,e in OLD_KOR_UNICODE]) + ']|[ㄱ-ㅎㅏ-ㅣ]+$',
+
+  #CleanRepr
+  'REPR_MARKS' : lambda : '[0-9\-]',
+  'HAS_SPACE_OPTION' : lambda : '.*\^',
+  'HAS_WORD_OPTION' : lambda : '.*\[.*\]',
+  'HAS_JOSA_OPTION' : lambda : '.*\(.*\)',
+  'WORD_OPTION' : lambda : '\[[^\]]+\]',
+  'JOSA_OPTION' : lambda : '\([^\)]*\)',
+  'JOSA_BRACKETS' : lambda : '[\(\)]',
+  'SPACES' : lambda : ' +',
+
+  #Options
+  'OPTION_TARGET' : lambda : '[^ ]*\[[^\]]+\]',
+  'OPTION_SPLIT' : lambda : '[\[\/]',
+
+  #CleanDef
+  'FIND_SYNONYM' : lambda : '‘[^’]*’',
+  'NUMBER' : lambda : NUMBERS,
+  'NUMBER_BRACKET' : lambda : CleanStr.rx_bracket(NUMBERS),
+  'LETTER_BRACKET' : lambda : CleanStr.rx_bracket(CHINESE_ENGLISH),
+  'NUMBER_SYNONYM' : lambda : '‘[0-9]+’',
+  'SYNONYM_MARKS' : lambda : '[\-\.\_\,]',
+  'APOSTROPHES' : lambda : '[‘’]',
+  'OR_THAT' : lambda : '또는 그런 것\.?$',
+  'UNCLOSED_SYNONYM' : lambda : '.*‘[^’]*',
+  'AFTER_SYNONYM' : lambda : '‘.*',
+  'ARROW' : lambda : '→ ',
+  'NORM' : lambda : '.*⇒ ?규범',
+  'SAME_MEANING' : lambda : '.*<동의 ?(속담|관용구)>',
+  'SAME_MEANING_SPLIT' : lambda : '<동의 속담>|<동의 관용구>',
+}
+
+
+def __getattr__(name : str) -> re.Pattern:
+  """Compile a pattern on its first use (PEP 562), later lookups find the module attribute"""
+  if name not in _SOURCES.keys():
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+  output = globals()[name] = re.compile(_SOURCES[name](), re.UNICODE)
+  return output
+
+
+def __dir__() -> list:
+  return sorted(list(globals().keys()) + list(_SOURCES.keys()))
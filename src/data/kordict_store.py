@@ -0,0 +1,378 @@
+import os
+import json
+import mmap
+import sqlite3
+import threading
+import numpy as np
+
+from pathlib import Path
+from functools import lru_cache
+from urllib.parse import quote
+from typing import Dict, List, Iterable, Iterator, Optional, Tuple, Union
+from collections.abc import Mapping
+from attrs import asdict
+
+try:
+  from kordict_io import ExternalSorter
+
+except:
+  from src.data.kordict_io import ExternalSorter
+
+
+CATEGORICAL = ['pos', 'unit', 'word_type']
+
+
+def write_columnar(entries : Iterable, 
+                   save_dir : Union[str, Path], 
+                   memory_budget : int = 256 << 20, 
+                   tmp_dir : Optional[str] = None):
+  """Save the dictionary entries (Wordinfo or dict) without duplicates as columns sorted by the representation form.
+  The entries are sorted on disk (kordict_io.ExternalSorter) within memory_budget bytes and the columns
+  are written chunk by chunk, so the entries are never all in memory
+
+  Files:
+    meta.json : the field names, the number of entries/keys and the tables of the categorical fields
+    keys.str, keys.off : the unique representation forms (utf-8) and their offsets
+    groups.off : the range of the entries of each representation form
+    <field>.str, <field>.off : the values of a field and their offsets
+    <field>.codes : the indices in the table of a categorical field
+  """
+  save_dir = Path(save_dir)
+  save_dir.mkdir(parents = True, exist_ok = True)
+  with ExternalSorter(memory_budget, tmp_dir) as sorter:
+    for x in entries:
+      record = x if type(x) == dict else asdict(x, recurse = False)
+      #the hex of the utf-8 bytes sorts as the keys are searched by ColumnarWordMap._find
+      sorter.add(record['repr'].encode('utf-8').hex() + '\t' + json.dumps(record, ensure_ascii = False))
+
+    fields, columns, keys, groups, n_entries = None, dict(), _StringColumn(save_dir / 'keys'), _Chunks(save_dir / 'groups.off', '<i8'), 0
+    for line in sorter.merged():
+      record = json.loads(line[line.index('\t') + 1:])
+      if fields == None:
+        fields = list(record.keys())
+        columns = {name : _CodeColumn(save_dir / (name + '.codes')) if name in CATEGORICAL else _StringColumn(save_dir / name) for name in fields}
+      
+      if keys.count == 0 or record['repr'] != previous:
+        keys.append(record['repr'])
+        groups.append(n_entries)
+        previous = record['repr']
+      for name in fields:
+        columns[name].append(record[name])
+      n_entries += 1
+
+  if fields == None: #no entries
+    fields = ['repr']
+    columns = {'repr' : _StringColumn(save_dir / 'repr')}
+  groups.append(n_entries)
+  meta = {'fields' : fields, 'entries' : n_entries, 'keys' : keys.count, 
+          'tables' : {name : x.table() for name, x in columns.items() if type(x) == _CodeColumn}}
+  for x in [keys, groups] + list(columns.values()):
+    x.close()
+
+  with open(save_dir / 'meta.json', 'w', encoding = 'utf-8') as f:
+    json.dump(meta, f, ensure_ascii = False)
+
+
+class _Chunks:
+  """Write numbers to a binary file, chunk_size at a time"""
+  def __init__(self, path : Path, dtype : str, chunk_size : int = 1 << 16):
+    self.f, self.dtype, self.chunk_size, self.pending = open(path, 'wb'), dtype, chunk_size, list()
+
+  def append(self, value : int):
+    self.pending.append(value)
+    if len(self.pending) >= self.chunk_size:
+      self.flush()
+
+  def flush(self):
+    np.asarray(self.pending, dtype = self.dtype).tofile(self.f)
+    self.pending = list()
+
+  def close(self):
+    self.flush()
+    self.f.close()
+
+
+class _StringColumn:
+  """Write the values of a string field (utf-8) and their offsets"""
+  def __init__(self, path : Path):
+    self.data, self.offsets = open(path.with_suffix('.str'), 'wb'), _Chunks(path.with_suffix('.off'), '<i8')
+    self.end, self.count = 0, 0
+    self.offsets.append(0)
+
+  def append(self, value : str):
+    encoded = value.encode('utf-8')
+    self.data.write(encoded)
+    self.end, self.count = self.end + len(encoded), self.count + 1
+    self.offsets.append(self.end)
+
+  def close(self):
+    self.data.close()
+    self.offsets.close()
+
+
+class _CodeColumn:
+  """Write the indices of the values of a categorical field in its table, made in the order of appearance"""
+  def __init__(self, path : Path):
+    self.codes, self.index = _Chunks(path, '<u2'), dict()
+
+  def append(self, value : str):
+    self.codes.append(self.index.setdefault(value, len(self.index)))
+
+  def table(self) -> List[str]:
+    return list(self.index.keys())
+
+  def close(self):
+    self.codes.close()
+
+
+class ColumnarWordMap(Mapping):
+  """Read-only mapping of the representation form to its entries, read lazily from the
+  memory-mapped files written by write_columnar. The pages are shared between processes
+  opening the same files."""
+  def __init__(self, path : Union[str, Path]):
+    self.path = Path(path)
+    with open(self.path / 'meta.json', 'r', encoding = 'utf-8') as f:
+      self.meta = json.load(f)
+    self.fields, self.tables = self.meta['fields'], self.meta['tables']
+    self._open()
+
+  def _open(self):
+    self.keys_str, self.keys_off = self._map('keys.str'), self._array('keys.off', '<i8')
+    self.groups = self._array('groups.off', '<i8')
+    self.codes = {name : self._array(name + '.codes', '<u2') for name in self.tables.keys()}
+    self.strings = {name : (self._map(name + '.str'), self._array(name + '.off', '<i8'))
+                    for name in self.fields if name not in self.tables.keys()}
+
+  def _map(self, name : str) -> Union[mmap.mmap, bytes]:
+    """Memory-map a file (mmap cannot map an empty file)"""
+    if os.path.getsize(self.path / name) == 0:
+      return b''
+    with open(self.path / name, 'rb') as f:
+      output = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    return output
+
+  def _array(self, name : str, dtype : str) -> np.ndarray:
+    return np.frombuffer(self._map(name), dtype = dtype)
+
+  def _key(self, idx : int) -> bytes:
+    return self.keys_str[self.keys_off[idx]:self.keys_off[idx + 1]]
+
+  def _find(self, key : str) -> int:
+    """Return the index of the key by binary search, -1 if there is not"""
+    target, lo, hi = key.encode('utf-8'), 0, self.meta['keys']
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if self._key(mid) < target:
+        lo = mid + 1
+      else:
+        hi = mid
+    return lo if lo < self.meta['keys'] and self._key(lo) == target else -1
+
+  def _entry(self, idx : int) -> Dict[str, str]:
+    output = dict()
+    for name in self.fields:
+      if name in self.tables.keys():
+        output[name] = self.tables[name][self.codes[name][idx]]
+      else:
+        data, offsets = self.strings[name]
+        output[name] = data[offsets[idx]:offsets[idx + 1]].decode('utf-8')
+    return output
+
+  def _group(self, idx : int) -> List[Dict[str, str]]:
+    return [self._entry(i) for i in range(self.groups[idx], self.groups[idx + 1])]
+
+  def __getitem__(self, key : str) -> List[Dict[str, str]]:
+    idx = self._find(key) if type(key) == str else -1
+    if idx < 0:
+      raise KeyError(key)
+    return self._group(idx)
+
+  def __contains__(self, key) -> bool:
+    return type(key) == str and self._find(key) >= 0
+
+  def __iter__(self) -> Iterator[str]:
+    for idx in range(self.meta['keys']):
+      yield self._key(idx).decode('utf-8')
+
+  def __len__(self) -> int:
+    return self.meta['keys']
+
+  def select(self, pos_list : List[str], word_type : str = '일반어') -> Dict[str, List[Dict[str, str]]]:
+    """Return the entries of the words which have a sense with one of pos_list and word_type,
+    scanning the categorical columns only"""
+    if 'pos' not in self.tables.keys() or 'word_type' not in self.tables.keys(): #an empty store
+      return dict()
+    pos_ids = [i for i, x in enumerate(self.tables['pos']) if x in pos_list]
+    type_ids = [i for i, x in enumerate(self.tables['word_type']) if x == word_type]
+    mask = np.isin(self.codes['pos'], pos_ids) & np.isin(self.codes['word_type'], type_ids)
+    found = np.unique(np.searchsorted(self.groups, np.nonzero(mask)[0], side = 'right') - 1)
+    return {self._key(idx).decode('utf-8') : self._group(idx) for idx in found}
+
+  def __getstate__(self):
+    return {'path' : self.path}
+
+  def __setstate__(self, state):
+    self.__init__(state['path'])
+
+
+def last_syllable(repr : str) -> str:
+  """Return the last syllable of the stem, the representation form without its last character 
+  (e.g. '기쁘다' -> '쁘'), as the key of FindConjugation.last_syl_index"""
+  return repr[-2:-1]
+
+
+def write_sqlite(entries : Iterable, path : Union[str, Path]):
+  """Save the dictionary entries (Wordinfo or dict) in a SQLite database
+
+  Tables:
+    entries : the fields of the entries and last_syl (see last_syllable), 
+              indexed on repr, pos, word_type and last_syl
+    meta : the field names
+  """
+  path = Path(path)
+  if path.exists():
+    path.unlink()
+  records = sorted([x if type(x) == dict else asdict(x) for x in entries], key = lambda x : x['repr'])
+  fields = list(records[0].keys()) if len(records) > 0 else ['repr']
+
+  conn = sqlite3.connect(path)
+  try:
+    columns = ', '.join('"%s" TEXT NOT NULL' % name for name in fields)
+    conn.execute('CREATE TABLE entries (id INTEGER PRIMARY KEY, %s, last_syl TEXT NOT NULL)' % columns)
+    conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    conn.execute('INSERT INTO meta VALUES (?, ?)', ('fields', json.dumps(fields)))
+    conn.executemany('INSERT INTO entries (%s, last_syl) VALUES (%s)' % (', '.join('"%s"' % x for x in fields), ', '.join(['?'] * (len(fields) + 1))),
+                     ([x[name] for name in fields] + [last_syllable(x['repr'])] for x in records))
+    for name in ['repr', 'pos', 'word_type', 'last_syl']: #faster to index after inserting
+      if name in fields + ['last_syl']:
+        conn.execute('CREATE INDEX idx_%s ON entries ("%s")' % (name, name))
+    conn.commit()
+  finally:
+    conn.close()
+
+
+class SqliteWordMap(Mapping):
+  """Read-only mapping of the representation form to its entries, queried from the database
+  written by write_sqlite. The database is opened read-only, once per thread, so many processes 
+  and threads can share it, and the entries of the recent lookups are kept in an LRU cache of cache_size words."""
+  def __init__(self, path : Union[str, Path], cache_size : int = 1 << 14):
+    self.path, self.cache_size = Path(path), cache_size
+    self.local = threading.local()
+    self.fields = json.loads(self.execute("SELECT value FROM meta WHERE key = 'fields'").fetchone()[0])
+    self.columns = ', '.join('"%s"' % x for x in self.fields)
+    self._lookup = lru_cache(maxsize = cache_size)(self._query)
+    self._len = None
+
+  def execute(self, sql : str, params : Iterable = ()) -> sqlite3.Cursor:
+    """Run a query on the connection of the current thread, as a connection cannot be shared by threads"""
+    conn = getattr(self.local, 'conn', None)
+    if conn == None:
+      conn = self.local.conn = sqlite3.connect('file:%s?mode=ro' % quote(str(self.path.resolve())), uri = True)
+    return conn.execute(sql, params)
+
+  def _entries(self, rows : Iterable[Tuple[str]]) -> List[Dict[str, str]]:
+    return [dict(zip(self.fields, x)) for x in rows]
+
+  def _query(self, key : str) -> List[Dict[str, str]]:
+    rows = self.execute('SELECT %s FROM entries WHERE repr = ? ORDER BY id' % self.columns, (key,))
+    return self._entries(rows)
+
+  def __getitem__(self, key : str) -> List[Dict[str, str]]:
+    output = self._lookup(key) if type(key) == str else list()
+    if len(output) == 0:
+      raise KeyError(key)
+    return output
+
+  def __contains__(self, key) -> bool:
+    return type(key) == str and len(self._lookup(key)) > 0
+
+  def __iter__(self) -> Iterator[str]:
+    for (key,) in self.execute('SELECT DISTINCT repr FROM entries ORDER BY repr'):
+      yield key
+
+  def __len__(self) -> int:
+    if self._len == None:
+      self._len = self.execute('SELECT COUNT(DISTINCT repr) FROM entries').fetchone()[0]
+    return self._len
+
+  def select(self, 
+             pos_list : List[str], 
+             word_type : str = '일반어', 
+             last_syl : Optional[str] = None,
+             fields : Optional[List[str]] = None) -> Dict[str, List[Dict[str, str]]]:
+    """Return the entries of the words which have a sense with one of pos_list and word_type
+    (and the last syllable of the stem, see last_syllable), using the indexes. 
+    If fields is given, the entries keep only those fields"""
+    condition = 'pos IN (%s) AND word_type = ?' % ', '.join(['?'] * len(pos_list))
+    params = list(pos_list) + [word_type]
+    if last_syl != None:
+      condition += ' AND last_syl = ?'
+      params.append(last_syl)
+    names = self.fields if fields == None else ['repr'] + [x for x in fields if x != 'repr']
+    rows = self.execute('SELECT %s FROM entries WHERE repr IN (SELECT repr FROM entries WHERE %s) ORDER BY repr, id' % (
+      ', '.join('"%s"' % x for x in names), condition), params)
+    output = dict()
+    for x in rows:
+      entry = dict(zip(names, x))
+      output.setdefault(entry['repr'], list()).append(entry)
+    return output
+
+  def view(self, pos_list : List[str], word_type : str = '일반어') -> 'SqliteSubMap':
+    """Return the words which have a sense with one of pos_list and word_type, queried on demand"""
+    return SqliteSubMap(self, pos_list, word_type, self.cache_size)
+
+  def cache_info(self):
+    return self._lookup.cache_info()
+
+  def __getstate__(self):
+    return {'path' : self.path, 'cache_size' : self.cache_size}
+
+  def __setstate__(self, state):
+    self.__init__(state['path'], state['cache_size'])
+
+
+class SqliteSubMap(Mapping):
+  """The words of a SqliteWordMap which have a sense with one of pos_list and word_type (e.g. the verb map 
+  of FindConjugation), queried on demand instead of copied. Whether the recent words belong to it
+  is kept in an LRU cache of cache_size words, their entries in that of the word map."""
+  def __init__(self, 
+               word_map : SqliteWordMap, 
+               pos_list : List[str], 
+               word_type : str = '일반어', 
+               cache_size : int = 1 << 14):
+    self.word_map, self.pos_list, self.word_type, self.cache_size = word_map, list(pos_list), word_type, cache_size
+    self.condition = 'pos IN (%s) AND word_type = ?' % ', '.join(['?'] * len(self.pos_list))
+    self.params = self.pos_list + [word_type]
+    self._has = lru_cache(maxsize = cache_size)(self._query)
+    self._len = None
+
+  def _query(self, key : str) -> bool:
+    #without statistics, the planner may pick the word_type index, which matches most of the rows
+    rows = self.word_map.execute('SELECT 1 FROM entries INDEXED BY idx_repr WHERE repr = ? AND %s LIMIT 1' % self.condition, [key] + self.params)
+    return rows.fetchone() != None
+
+  def __getitem__(self, key : str) -> List[Dict[str, str]]:
+    if key not in self:
+      raise KeyError(key)
+    return self.word_map[key]
+
+  def __contains__(self, key) -> bool:
+    return type(key) == str and self._has(key)
+
+  def __iter__(self) -> Iterator[str]:
+    for (key,) in self.word_map.execute('SELECT DISTINCT repr FROM entries WHERE %s ORDER BY repr' % self.condition, self.params):
+      yield key
+
+  def __len__(self) -> int:
+    if self._len == None:
+      self._len = self.word_map.execute('SELECT COUNT(DISTINCT repr) FROM entries WHERE %s' % self.condition, self.params).fetchone()[0]
+    return self._len
+
+  def cache_info(self):
+    return self._has.cache_info()
+
+  def __getstate__(self):
+    return {'word_map' : self.word_map, 'pos_list' : self.pos_list, 'word_type' : self.word_type, 'cache_size' : self.cache_size}
+
+  def __setstate__(self, state):
+    self.__init__(state['word_map'], state['pos_list'], state['word_type'], state['cache_size'])
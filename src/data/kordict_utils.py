@@ -1,23 +1,26 @@
 import re
 from typing import List, Dict, Optional, Union
 from jamo import h2j, j2hcj
-from cached_property import cached_property
+from functools import cached_property
 from boltons.iterutils import pairwise
 from itertools import product
 from jamo import j2hcj, h2j
 
 try:
-  from utils import ROMAN_NUM_UNICODE, CHINESE_UNICODE, CleanStr
+  from utils import CleanStr
+  from profiling import instrument
+  import kordict_rx as rx
 
 except:
-  from src.data.utils import ROMAN_NUM_UNICODE, CHINESE_UNICODE, CleanStr
+  from src.data.utils import CleanStr
+  from src.data.profiling import instrument
+  from src.data import kordict_rx as rx
   
 
 EOMI = 'ㅕㅓㅏㅑㅘㅝㅐㅒㅖㅔ'
-NUMBERS =  '[' + '0-9' + ''.join(['%s-%s' % (s,e) for s,e in ROMAN_NUM_UNICODE]) + ']'
-CHINESE_ENGLISH =  '[A-Za-z' + ''.join(['%s-%s' % (s,e) for s,e in CHINESE_UNICODE]) + ']'
 
 
+@instrument('clean_conju')
 def clean_conju(item : List[Dict[str, str]]) -> str:
   c, a, i= 'conjugation', 'abbreviation', '_info'
   items = [[x[c + i][c], x[a + i][a] if a + i in x.keys() else None] for x in item]
@@ -65,7 +68,7 @@ class Options:
   @cached_property
   def targets(self):
     """Returns a range matched with 'OptionOne[OptionTwo/OptionThree]'"""
-    return re.findall('[^ ]*\[[^\]]+\]', self.input)
+    return rx.OPTION_TARGET.findall(self.input)
 
   @cached_property
   def options(self):
@@ -74,7 +77,7 @@ class Options:
 
   def split_option(self, target : str) -> List[str]:
     """Change a string with [] into a list"""
-    items = re.split('[\[\/]', re.sub('\]', '', target))
+    items = rx.OPTION_SPLIT.split(target.replace(']', ''))
     return [x for x in items if len(x.strip(' ')) > 0]
 
   def _build(self):
@@ -106,8 +109,8 @@ class CleanRepr:
                    word : str, 
                    options : Optional[List[str]] = None):
     """Change '^' into space or Delete '^' mark"""
-    rep = re.sub('\^', ' ', word) #change into space
-    with_space = re.sub('\^', '', word) #delete ^ mark
+    rep = word.replace('^', ' ') #change into space
+    with_space = word.replace('^', '') #delete ^ mark
     if rep != word and self.save_options == True:
       options += [rep, with_space]
 
@@ -117,7 +120,7 @@ class CleanRepr:
                   phrase : str, 
                   options : Optional[List[str]] = None):
     """Delete '[Option1/Option2]' in the representation form"""
-    rep = re.sub('\[[^\]]+\]', '', phrase)
+    rep = rx.WORD_OPTION.sub('', phrase)
     if self.save_options == True:
       if len(options) == 0:
         options.append(phrase)
@@ -131,92 +134,105 @@ class CleanRepr:
                   word : str, 
                   options : Optional[List[str]] = None):
     """Delete '(Option)' in the representation form (e.g. 밥(을) 먹다)"""
-    rep = re.sub('\([^\)]*\)', '', word)  
+    rep = rx.JOSA_OPTION.sub('', word)
     if self.save_options == True:
       if len(options) == 0:
         options.append(word)
 
-      without_josa = list(map(lambda x : re.sub('\([^\)]*\)', '', x), options))
-      with_josa = list(map(lambda x : re.sub('[\(\)]', '', x), options))
+      without_josa = list(map(lambda x : rx.JOSA_OPTION.sub('', x), options))
+      with_josa = list(map(lambda x : rx.JOSA_BRACKETS.sub('', x), options))
       options = without_josa + with_josa
 
     return rep, options
 
+  @instrument('CleanRepr._build')
   def _build(self) -> str:
     """revise word represetation form with all the rules"""
-    rep = re.sub('[0-9\-]', '', self.input)
+    rep = rx.REPR_MARKS.sub('', self.input)
     options = list() if self.save_options == True else None
 
-    if re.match('.*\^', rep): #delete ^
+    if rx.HAS_SPACE_OPTION.match(rep): #delete ^
       rep, options = self.space_option(rep, options)
 
-    if re.match('.*\[.*\]', rep): #delete 
+    if rx.HAS_WORD_OPTION.match(rep): #delete 
       rep, options = self.word_option(rep, options)
 
-    if re.match('.*\(.*\)', rep):
+    if rx.HAS_JOSA_OPTION.match(rep):
       rep, options = self.josa_option(rep,options)
 
     if self.save_options == True:
       options += [rep]
-      options = list(map(lambda x : re.sub(' +', ' ', x.strip(' ')), options))
+      options = list(map(lambda x : rx.SPACES.sub(' ', x.strip(' ')), options))
       options = list(set(options))
 
-    return re.sub(' +', ' ', rep.strip(' ')), options
+    return rx.SPACES.sub(' ', rep.strip(' ')), options
 
+  @staticmethod
+  def clean(input : str) -> str:
+    """Return the representation form only, same as CleanRepr(input, False).output[0]"""
+    rep = rx.REPR_MARKS.sub('', input)
+    if rx.HAS_SPACE_OPTION.match(rep):
+      rep = rep.replace('^', ' ')
 
-class CleanDef:
-  find_synonym = re.compile('‘[^’]*’')
-  number_bracket = re.compile(CleanStr.rx_bracket(NUMBERS))
-  letter_bracket = re.compile(CleanStr.rx_bracket(CHINESE_ENGLISH))
+    if rx.HAS_WORD_OPTION.match(rep):
+      rep = rx.WORD_OPTION.sub('', rep)
+
+    if rx.HAS_JOSA_OPTION.match(rep):
+      rep = rx.JOSA_OPTION.sub('', rep)
+
+    return rx.SPACES.sub(' ', rep.strip(' '))
 
+
+class CleanDef:
   def __init__(self, input : str, word :str):
     self.input = input
     self.word = word
     self.output = self._build()
 
   def _split(self, line : str) -> List[str]:
-    idx = [[x.start(0), x.end(0)] for x in self.find_synonym.finditer(line)]
+    idx = [[x.start(0), x.end(0)] for x in rx.FIND_SYNONYM.finditer(line)]
     total_idx = sorted(sum(idx, []) + [0, len(line)])
     tokens = [line[s:e] for s,e in pairwise(total_idx) if len(line[s:e]) > 0]
-    token_idx = [idx for idx, token in enumerate(tokens) if self.find_synonym.match(token)]
+    token_idx = [idx for idx, token in enumerate(tokens) if rx.FIND_SYNONYM.match(token)]
     return tokens, token_idx
 
   def _clean_synonym(self, token : str) -> str:
     """Revise words inside apostrophes‘’"""
-    output = self.number_bracket.sub('', token)
-    output = re.sub(NUMBERS, '', output) if not re.match('‘[0-9]+’', output) else output
+    output = rx.NUMBER_BRACKET.sub('', token)
+    output = rx.NUMBER.sub('', output) if not rx.NUMBER_SYNONYM.match(output) else output
     output = '‘%s’' % (self.word) if output == '‘’' and token != '‘’' else output
-    output, _ = CleanRepr(output, False).output
-    return re.sub('[\-\.\_\,]', '', output)
+    output = CleanRepr.clean(output)
+    return rx.SYNONYM_MARKS.sub('', output)
 
   def _clean_def(self, token : str) -> str:
-    output = self.letter_bracket.sub('', token)
-    return re.sub('또는 그런 것\.?$', '',output)
+    output = rx.LETTER_BRACKET.sub('', token)
+    return rx.OR_THAT.sub('',output)
 
+  @instrument('CleanDef._build')
   def _build(self):
     input = CleanStr.clear_html(self.input)
-    revised = re.sub('‘.*', '', input) if re.fullmatch('.*‘[^’]*', input) else input
+    revised = rx.AFTER_SYNONYM.sub('', input) if rx.UNCLOSED_SYNONYM.fullmatch(input) else input
 
-    if revised.startswith('→')and len(self.find_synonym.findall(revised)) == 0:#synonym == definition
-      output = self._clean_synonym(re.sub('→ ','', revised))
-      return '→' + output, [re.sub('[‘’]', '', output)]
+    if revised.startswith('→')and len(rx.FIND_SYNONYM.findall(revised)) == 0:#synonym == definition
+      output = self._clean_synonym(rx.ARROW.sub('', revised))
+      return '→' + output, [rx.APOSTROPHES.sub('', output)]
 
-    elif re.match('.*⇒ ?규범', revised):
+    elif rx.NORM.match(revised):
       parts = revised.split('⇒')
       definition, rest = parts[0], parts[-1]
       tokens, token_idx = self._split(rest)
-      synonym = [re.sub('[‘’]', '',self._clean_synonym(t)) for i, t in enumerate(tokens) if i in token_idx]
+      synonym = [rx.APOSTROPHES.sub('',self._clean_synonym(t)) for i, t in enumerate(tokens) if i in token_idx]
       return self._clean_def(definition), synonym
     
-    elif re.match('.*<동의 ?(속담|관용구)>', revised):
-      parts = re.split('<동의 속담>|<동의 관용구>', revised)
+    elif rx.SAME_MEANING.match(revised):
+      parts = rx.SAME_MEANING_SPLIT.split(revised)
       definition, rest = parts[0], parts[-1]
       tokens, token_idx = self._split(rest)
-      synonym = [re.sub('[‘’]', '',self._clean_synonym(t)) for i, t in enumerate(tokens) if i in token_idx]
+      synonym = [rx.APOSTROPHES.sub('',self._clean_synonym(t)) for i, t in enumerate(tokens) if i in token_idx]
       return self._clean_def(definition), synonym 
 
     else:
       tokens, token_idx = self._split(revised)
       output = [self._clean_synonym(t) if i in token_idx else self._clean_def(t) for i, t in enumerate(tokens)]
       definition = ''.join(output[token_idx[0]:]) if revised.startswith('→') else ''.join(output)
-      return CleanStr.clear_space(definition), [re.sub('[‘’]', '',self._clean_synonym(t)) for i, t in enumerate(tokens) if i in token_idx]
+      return CleanStr.clear_space(definition), [rx.APOSTROPHES.sub('',self._clean_synonym(t)) for i, t in enumerate(tokens) if i in token_idx]
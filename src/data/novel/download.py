@@ -0,0 +1,173 @@
+"""Download many novels from ko.wikisource concurrently, keeping the raw html on disk
+
+  downloader = WikiDownloader('./html_cache', workers = 8, rate = 2)
+  novels = downloader.novels(['운수_좋은_날', '메밀꽃_필_무렵'])
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import requests
+from pathlib import Path
+from collections import Counter
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from src.data.novel.utils import WikiNovel
+
+
+class HtmlCache:
+  """The raw html of each url with its ETag and Last-Modified headers
+  (<sha1 of url>.html and <sha1 of url>.json)"""
+  def __init__(self, cache_dir : str):
+    self.cache_dir = Path(cache_dir)
+    self.cache_dir.mkdir(parents = True, exist_ok = True)
+
+  def _path(self, url : str) -> Path:
+    return self.cache_dir / hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+  def get(self, url : str) -> Optional[Tuple[str, Dict[str, str]]]:
+    path = self._path(url)
+    if not (path.with_suffix('.html').exists() and path.with_suffix('.json').exists()):
+      return None
+    with open(path.with_suffix('.json'), 'r', encoding = 'utf-8') as f:
+      meta = json.load(f)
+    with open(path.with_suffix('.html'), 'r', encoding = 'utf-8') as f:
+      return f.read(), meta
+
+  def put(self, url : str, html : str, headers : Dict[str, str]):
+    path = self._path(url)
+    meta = {'url' : url, 'etag' : headers.get('ETag'), 'last_modified' : headers.get('Last-Modified')}
+    for suffix, content in [('.html', html), ('.json', json.dumps(meta, ensure_ascii = False))]:
+      with open(path.with_suffix(suffix + '.tmp'), 'w', encoding = 'utf-8') as f:
+        f.write(content)
+      os.replace(path.with_suffix(suffix + '.tmp'), path.with_suffix(suffix))
+
+
+class RateLimiter:
+  """Let at most `rate` requests per second start for each host"""
+  def __init__(self, rate : float):
+    self.interval = 1 / rate if rate > 0 else 0
+    self.next, self.lock = dict(), threading.Lock()
+
+  def wait(self, url : str):
+    host = urlsplit(url).netloc
+    with self.lock: #book the next slot of the host
+      now = time.monotonic()
+      slot = max(now, self.next.get(host, now))
+      self.next[host] = slot + self.interval
+    if slot > now:
+      time.sleep(slot - now)
+
+
+class WikiDownloader:
+  """Fetch the html of many titles with a bounded thread pool, each thread with its own session
+  (requests.Session is not thread-safe)
+
+  Attributes:
+    workers : the number of concurrent requests
+    rate : the maximum number of requests per second to a host
+    revalidate : if False, cached pages are used without any request; 
+                 if True, they are revalidated with If-None-Match / If-Modified-Since
+    wiki : the base url, WikiNovel.wiki by default (e.g. a local server for tests)
+    stats : the numbers of cached, revalidated(304), downloaded and failed pages
+    failed : the error of each title which could not be fetched by the last fetch_all
+  """
+  def __init__(self,
+               cache_dir : str,
+               workers : int = 8,
+               rate : float = 2.0,
+               revalidate : bool = False,
+               wiki : Optional[str] = None,
+               timeout : float = 30):
+    self.cache, self.limiter = HtmlCache(cache_dir), RateLimiter(rate)
+    self.workers, self.revalidate, self.timeout = workers, revalidate, timeout
+    self.wiki = WikiNovel.wiki if wiki == None else wiki
+    self.stats, self.lock, self.failed = Counter(), threading.Lock(), dict()
+    self.local = threading.local()
+
+  @property
+  def session(self) -> requests.Session:
+    """The session of the current thread, keeping its connections alive between the titles"""
+    if not hasattr(self.local, 'session'):
+      self.local.session = requests.Session()
+      adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = 1)
+      self.local.session.mount('http://', adapter)
+      self.local.session.mount('https://', adapter)
+    return self.local.session
+
+  def _count(self, key : str):
+    with self.lock:
+      self.stats[key] += 1
+
+  def fetch(self, title : str) -> str:
+    """Return the html of a title from the cache or the server"""
+    url = self.wiki + title
+    cached = self.cache.get(url)
+    if cached != None and self.revalidate == False:
+      self._count('cached')
+      return cached[0]
+
+    headers = dict()
+    if cached != None:
+      if cached[1]['etag'] != None:
+        headers['If-None-Match'] = cached[1]['etag']
+      if cached[1]['last_modified'] != None:
+        headers['If-Modified-Since'] = cached[1]['last_modified']
+
+    self.limiter.wait(url)
+    response = self.session.get(url, headers = headers, timeout = self.timeout)
+    if response.status_code == 304 and cached != None:
+      self._count('revalidated')
+      return cached[0]
+
+    response.raise_for_status()
+    self.cache.put(url, response.text, response.headers)
+    self._count('downloaded')
+    return response.text
+
+  def fetch_all(self, titles : List[str]) -> Dict[str, str]:
+    """Return the html of each title, fetched concurrently.
+    A title which fails does not stop the others : it is left out and its error is kept in self.failed"""
+    output, self.failed = dict(), dict()
+    with ThreadPoolExecutor(self.workers) as pool:
+      futures = {pool.submit(self.fetch, title) : title for title in titles}
+      for future in as_completed(futures):
+        try:
+          output[futures[future]] = future.result()
+        except Exception as e:
+          self.failed[futures[future]] = repr(e)
+          self._count('failed')
+
+    for title, error in self.failed.items():
+      print('%s failed : %s' % (title, error), file = sys.stderr)
+    return {title : output[title] for title in titles if title in output.keys()} #in the order of titles
+
+  def novels(self, titles : List[str], parser : Optional[str] = None) -> Dict[str, WikiNovel]:
+    """parser is the parser of bs4, WikiNovel.parser by default"""
+    return {title : WikiNovel(title, html, parser, self.wiki) for title, html in self.fetch_all(titles).items()}
+
+
+if __name__ == '__main__':
+  sys.path.append(os.getcwd())
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--title_dir", type=str, help = 'A text file with one title per line')
+  parser.add_argument("--cache_dir", type=str, default = './html_cache')
+  parser.add_argument("--workers", type=int, default = 8)
+  parser.add_argument("--rate", type=float, default = 2.0, help = 'The maximum number of requests per second')
+  parser.add_argument("--revalidate", action = 'store_true', help = 'Revalidate the cached pages with the server')
+  parser.add_argument("--wiki", type=str, default = None, help = 'The base url, ko.wikisource by default')
+  args = parser.parse_args()
+
+  with open(args.title_dir, 'r', encoding = 'utf-8') as f:
+    titles = [x.strip() for x in f if len(x.strip()) > 0]
+
+  start = time.perf_counter()
+  downloader = WikiDownloader(args.cache_dir, args.workers, args.rate, args.revalidate, args.wiki)
+  downloader.fetch_all(titles)
+  print('%d titles in %.1fs' % (len(titles), time.perf_counter() - start), dict(downloader.stats))
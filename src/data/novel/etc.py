@@ -1,14 +1,13 @@
-import pandas as pd
-import numpy as np
 import re
-from typing import List, Any, Tuple, Optional
-from cached_property import cached_property
+from typing import List, Any, Tuple, Optional, Iterable, Iterator
+from functools import cached_property
 from boltons.iterutils import pairwise
-from tqdm import tqdm
-from toolz import partition
-from itertools import product
+from itertools import chain
+from bisect import bisect_left
+from collections import deque
 
 from src.data.utils import del_zeros
+from src.data.profiling import instrument
 from data.rx_codes import line_rx, end_rx, indirect_rx, after_indirect_rx
 
 class QuotationChanger:
@@ -18,35 +17,63 @@ class QuotationChanger:
     self.input, self.up_to, self.step = input, up_to, 1
     self.output = list() + self.input
     self._build()
+
+  @classmethod
+  def stream(cls, lines : Iterable[str], up_to : int = 20) -> Iterator[str]:
+    """Yield the revised lines holding at most up_to lines at a time, 
+    the same as QuotationChanger(list(lines), up_to).output"""
+    changer = cls(list(), up_to)
+    output = iter(lines)
+    for m in ['"', "'"]:
+      output = changer._stream_q(output, m)
+    
+    for line in output:
+      for m in ['"', "'"]:
+        line = changer._force_line(line, m)
+      yield line
   
-  def other_mark(self):
+  def other_mark(self, mark : Optional[str] = None):
     """ if self.mark is ", the other mark is ' """
-    return re.sub(self.mark, '', '"\'')
+    return re.sub(self.mark if mark == None else mark, '', '"\'')
 
-  def _find_loop(self, line : str, idx : int):
-    """Search the quotation marks and merge lines"""
-    self.step = 1 #Reset self.next
+  def _merge_lines(self, line : str, following : List[str], mark : str) -> Tuple[Optional[str], int]:
+    """Merge the line with the following lines until the number of the quotation marks is even.
+    Return the merged line (None if it is still odd) and the number of the merged following lines.
+    The numbers of the marks are added up line by line instead of counting the merged line again"""
+    other, step, parts, swap = self.other_mark(mark), 1, [line], False
+    counts = {mark : line.count(mark), other : line.count(other)}
 
-    while line.count(self.mark) % 2 == 1 and self.step < self.up_to:
-      if self.step + idx > len(self.output) - 1:
+    while counts[mark] % 2 == 1 and step < self.up_to:
+      if step > len(following):
+        break
+
+      next = following[step - 1]
+      parts.append(next)
+      n_mark, n_other = next.count(mark), next.count(other)
+      counts[mark], counts[other] = counts[mark] + n_mark, counts[other] + n_other
+
+      if n_mark % 2 == 1:
+        break
+
+      elif n_other % 2 == 1: #' is changed into "
+        swap = True
+        counts = {'"' : counts['"'] + counts["'"], "'" : 0}
         break
 
       else:
-        next = self.output[idx + self.step]
-        line = line + ' ' + next
-
-        if next.count(self.mark) % 2 == 1: 
-          break
-      
-        elif next.count(self.other_mark()) % 2 == 1:
-          line = re.sub("'", '"', line)
-          break
-
-        else:
-          self.step += 1
-        
-    if line.count(self.mark) % 2 == 0:#Update the changes
-      self.output[idx] = line
+        step += 1
+
+    if counts[mark] % 2 == 1:
+      return None, step
+    
+    merged = ' '.join(parts)
+    return merged.replace("'", '"') if swap == True else merged, step
+
+  def _find_loop(self, line : str, idx : int):
+    """Search the quotation marks and merge lines"""
+    merged, self.step = self._merge_lines(line, self.output[idx + 1 : idx + self.up_to], self.mark)
+    if merged != None:#Update the changes
+      self.output[idx] = merged
       for _ in range(1, self.step + 1):
         self.output[idx + _] = ''
 
@@ -57,20 +84,49 @@ class QuotationChanger:
         self._find_loop(line, idx)
     self.output = del_zeros(self.output)
 
-  def _force_q(self):
-    """Force the quotation marks to make the numbers even"""
-    for idx, x in enumerate(self.output):
-      if x.count(self.mark) % 2 != 1: pass
+  def _stream_q(self, lines : Iterator[str], mark : str) -> Iterator[str]:
+    """The streaming version of _revise_q, reading ahead at most up_to - 1 lines"""
+    window = deque()
+    while True:
+      line = window.popleft() if len(window) > 0 else next(lines, None)
+      if line == None:
+        break
+
+      if line.count(mark) % 2 == 1:
+        while len(window) < self.up_to - 1:
+          following = next(lines, None)
+          if following == None:
+            break
+          window.append(following)
+
+        merged, step = self._merge_lines(line, list(window), mark)
+        if merged != None:
+          line = merged
+          for _ in range(step):
+            window.popleft()
+
+      if len(line.strip(' ')) > 0:
+        yield line.strip(' ')
 
-      elif len(x.split(' ')) == 1:
-        self.output[idx] =  x + self.mark
+  def _force_line(self, x : str, mark : str) -> str:
+    """Force the quotation marks of a line to make the number even"""
+    if x.count(mark) % 2 != 1:
+      return x
 
-      elif '⋯' in x and x.find(self.mark) < x.find('⋯'):
-        self.output[idx] = x.replace('⋯', '⋯' + self.mark, 1)
+    elif len(x.split(' ')) == 1:
+      return x + mark
+
+    elif '⋯' in x and x.find(mark) < x.find('⋯'):
+      return x.replace('⋯', '⋯' + mark, 1)
   
-      else:
-        self.output[idx] = re.sub(self.mark, '', x)
+    else:
+      return re.sub(mark, '', x)
+
+  def _force_q(self):
+    """Force the quotation marks to make the numbers even"""
+    self.output = [self._force_line(x, self.mark) if x.count(self.mark) % 2 == 1 else x for x in self.output]
   
+  @instrument('QuotationChanger._build')
   def _build(self):
     for m in ['"', "'"]:
       self.mark = m
@@ -88,43 +144,61 @@ class QuotationChanger:
 
   
 class LineChanger:
-  def __init__(self, input : str):
+  def __init__(self, input : str, streaming : bool = False):
+    """If streaming is True, the output is a generator of the lines instead of a list"""
     self.input = input
     self.line_rx, self.end, self.indirect, self.after_indirect = line_rx, end_rx, indirect_rx, after_indirect_rx 
-    self.output = self._build()
+    self.output = self._iter_build() if streaming == True else self._build()
+
+  @classmethod
+  def stream(cls, paragraphs : Iterable[str]) -> Iterator[str]:
+    """Yield the lines of the paragraphs one by one, the same as LineChanger(p).output of each paragraph"""
+    for paragraph in paragraphs:
+      yield from cls(paragraph, True).output
     
-  def _target(self, mark : str, input : Optional[str] = None) -> List[str]:
-    """Get the pairs of the quotation marks' indice"""
-    text = self.input if input == None else input  
-    indice = np.where(np.array(list(text)) == mark)[0]#find all the indices
-    return list(partition(2, indice))#return them in pairs
+  def _target(self, text : str) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """Get the pairs of the double and single quotation marks' indice in one scan"""
+    double, single = list(), list()
+    for mark in re.finditer('["\']', text):
+      (double if mark.group() == '"' else single).append(mark.start())
+    return list(zip(double[0::2], double[1::2])), list(zip(single[0::2], single[1::2]))#return them in pairs
   
   def _avoid(self, double : List[Tuple[Any]], single : List[Tuple[Any]]):
-    """Delete the overlapped indice pairs"""
-    return set([s for d, s in product(double, 
-                                      single) if d[0] < s[0] and s[-1] < d[-1]])
+    """Delete the overlapped indice pairs : the single pairs inside a double pair.
+    The double pairs are sorted and disjoint, so only the last one starting before a single pair can hold it"""
+    starts = [d[0] for d in double]
+    output = set()
+    for s in single:
+      idx = bisect_left(starts, s[0]) - 1
+      if idx >= 0 and s[-1] < double[idx][-1]:
+        output.add(s)
+    return output
     
   def _emphasis(self, s : int, e: int, input : Optional[str] = None) -> bool:
     """Decide whether this is a stressed phrase or word, not a line(e.g. the 'cute' dog)"""
     text = self.input if input == None else input
-    target, front = text[s:e+1], text[:s]
+    target, front = text[s:e+1], text[:s].rstrip(' ')
     a = len(target.split(' ')) < 4 #less than four word
     b = len(self.end.findall(target)) == 0 #no end marks inside the token
-    c = not bool(re.fullmatch('.*[\.\?\!] *', front)) if len(front) > 0 else True #no end marks in the token
+    #same as not re.fullmatch('.*[\.\?\!] *', text[:s]) without matching the whole front
+    c = not (len(front) > 0 and front[-1] in '.?!' and '\n' not in front) if s > 0 else True #no end marks in the token
     return not (a and b and c) #emphasis -> False -> filtered
 
-  @cached_property
-  def tokens(self) -> List[str]:
-    """Return the parts of text split by " and ' """
-    double = self._target('"')
-    single = list(filter(lambda x :self._emphasis(x[0], x[1]), self._target("'")))      
+  def _pairs(self, text : str) -> List[Tuple[int, int]]:
+    """Return the sorted pairs of quotation marks except emphasis and the single ones inside double ones"""
+    double, single = self._target(text)
+    single = list(filter(lambda x :self._emphasis(x[0], x[1], text), single))
     
     total = set(double + single) #a list of tuple
     if len(double) > 0 and len(single) > 0: #to avoid being overlapped
-      total -= set(self._avoid(double, single))
+      total -= self._avoid(double, single)
+    return sorted(total, key = lambda x: x[0])
 
-    target = [[s, e+1] for s, e in sorted(total, key = lambda x: x[0])]
-    target = sorted(sum(target, []) + [0, len(self.input)]) #to cover start to end
+  @cached_property
+  def tokens(self) -> List[str]:
+    """Return the parts of text split by " and ' """
+    target = chain.from_iterable([s, e+1] for s, e in self._pairs(self.input))
+    target = sorted(list(target) + [0, len(self.input)]) #to cover start to end
     return [self.input[s:e] for s,e in pairwise(target) if len(self.input[s:e]) > 0]
 
   def _split(self, item : str) -> List[str]:
@@ -135,22 +209,21 @@ class LineChanger:
     output = [item[s:e] for s, e in pairwise(sorted([0, l+1] + indices))]
     return del_zeros(output)
   
-  def _merge(self, input : List[str]) -> List[str]:
+  def _merge(self, input : Iterable[str]) -> Iterator[str]:
     """Merge lines to generate indirect quotation sentence"""
-    output = list()
-    while len(input) >= 2:#if one is a line, the other should not be a line
-      now = bool(re.match('[\'\"]', input[0][-1]))
-      next = bool(re.match('[\'\"]', input[1][0]))
-      end = not bool(self.end.match(input[0][-1]))
-      if (now != next) and end:
-        input = [' '.join(input[:2])] + input[2:]
-        
-      else:
-        output.append(input[0])
-        input = input[1:]
-    
-    output += input
-    return output 
+    parts = list()
+    for item in input:#if one is a line, the other should not be a line
+      if len(parts) > 0:
+        now = bool(re.match('[\'\"]', parts[-1][-1]))
+        next = bool(re.match('[\'\"]', item[0]))
+        end = not bool(self.end.match(parts[-1][-1]))
+        if not ((now != next) and end):
+          yield ' '.join(parts)
+          parts = list()
+      parts.append(item)
+
+    if len(parts) > 0:
+      yield ' '.join(parts)
 
   def _indirect(self, s : int, e : int, text : str) -> bool:
     """Decide whether this is an indirect quotation"""
@@ -163,19 +236,22 @@ class LineChanger:
     return not ((a or b or c) and d) #indirect -> False -> filtered
 
   def _revise(self, token):
-    double = self._target('"', token)
-    single = list(filter(lambda x :self._emphasis(x[0], x[1], token), self._target("'", token)))      
-    total = set(double + single) #a list of tuple
-    if len(double) > 0 and len(single) > 0: #to avoid being overlapped
-      total -= set(self._avoid(double, single))
-    
-    target = [[s, e+1] for s, e in sorted(total, key = lambda x: x[0])]
+    target = [[s, e+1] for s, e in self._pairs(token)]
     filtered = list(filter(lambda x: self._indirect(x[0], x[1], token), target))
-    filtered = sorted(sum(filtered, []) + [0, len(token)]) #to cover start to end
+    filtered = sorted(list(chain.from_iterable(filtered)) + [0, len(token)]) #to cover start to end
     return [token[s:e] for s,e in pairwise(filtered) if len(token[s:e]) > 0]
   
-  def _build(self):
+  def _iter_build(self) -> Iterator[str]:
+    """Yield the lines split by end marks"""
+    divided = chain.from_iterable([t] if self.line_rx.match(t) else self._split(t) for t in self.tokens)
+    for merged in self._merge(divided):
+      merged = merged.strip(' ')
+      if len(merged) > 0:
+        for line in self._revise(merged):
+          if len(line.strip(' ')) > 0:
+            yield line.strip(' ')
+
+  @instrument('LineChanger._build')
+  def _build(self) -> List[str]:
     """Return the lines split by end marks"""
-    divided = sum([[t] if self.line_rx.match(t) else self._split(t) for t in self.tokens],[])
-    merged = del_zeros(self._merge(divided))
-    return del_zeros(sum(list(map(self._revise, merged)),[]))
+    return list(self._iter_build())
@@ -0,0 +1,172 @@
+"""Annotate raw novels with emotions : QuotationChanger -> LineChanger -> EmotionMatcher
+
+The novels (*.txt, one paragraph per line) are split into shards processed in a process pool.
+Each finished shard is written to shard_#####.jsonl and recorded in checkpoint.json,
+so a rerun with the same arguments skips it.
+
+  python -m src.data.novel.pipeline --input_dir novels/ --pattern_dir corpus_Ours.jsonl --save_dir out/
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from itertools import chain
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from src.data.novel.etc import QuotationChanger, LineChanger
+from src.data.emotion_matcher import EmotionMatcher
+from src.data import profiling
+
+_matcher = None #built once in each worker
+
+
+def _init_worker(pattern_dir : str, max_gap : int):
+  global _matcher
+  _matcher = EmotionMatcher.from_file(pattern_dir, max_gap)
+
+
+def annotate(text : str, matcher : EmotionMatcher) -> Iterator[Dict]:
+  """Yield the sentences of a novel with their emotion hits"""
+  paragraphs = [x.strip() for x in text.split('\n') if len(x.strip()) > 0]
+  lines = QuotationChanger(paragraphs).output
+  sentences = chain.from_iterable(LineChanger(x).output for x in lines)
+  for sentence_id, sentence in enumerate(sentences):
+    yield {'sentence_id' : sentence_id, 'sentence' : sentence, 'hits' : matcher.scan(sentence, sentence_id)}
+
+
+def process_shard(job : Tuple[int, List[str], str]) -> Dict:
+  """Annotate the novels of a shard and return its summary"""
+  shard_id, paths, save_dir = job
+  start, emotions = time.perf_counter(), Counter()
+  n_sentences, n_hits = 0, 0
+  output = Path(save_dir) / ('shard_%05d.jsonl' % shard_id)
+
+  with open(output.with_suffix('.tmp'), 'w', encoding = 'utf-8') as f:
+    for path in paths:
+      with open(path, 'r', encoding = 'utf-8') as novel:
+        text = novel.read()
+
+      for record in annotate(text, _matcher):
+        record['novel'] = Path(path).stem
+        f.write(json.dumps(record, ensure_ascii = False) + '\n')
+        n_sentences += 1
+        n_hits += len(record['hits'])
+        emotions.update(chain.from_iterable(x['emotion'] for x in record['hits']))
+  os.replace(output.with_suffix('.tmp'), output) #only complete shards have the final name
+
+  return {'shard' : shard_id,
+          'novels' : len(paths),
+          'sentences' : n_sentences,
+          'hits' : n_hits,
+          'emotions' : dict(emotions),
+          'elapsed' : time.perf_counter() - start}
+
+
+class Checkpoint:
+  """The summaries of the finished shards, saved in checkpoint.json after each shard
+
+  Attributes:
+    shards : the novels of each shard, which must be the same to resume
+    done : the summaries of the finished shards by shard id
+  """
+  def __init__(self, save_dir : str, shards : List[List[str]]):
+    self.path, self.shards, self.done = Path(save_dir) / 'checkpoint.json', shards, dict()
+    if self.path.exists():
+      with open(self.path, 'r', encoding = 'utf-8') as f:
+        data = json.load(f)
+      if data['shards'] != shards:
+        raise ValueError('%s was made from other novels or shard size, remove it to start over' % self.path)
+      self.done = {int(k) : v for k, v in data['done'].items()}
+
+  def add(self, summary : Dict):
+    self.done[summary['shard']] = summary
+    with open(self.path.with_suffix('.tmp'), 'w', encoding = 'utf-8') as f:
+      json.dump({'shards' : self.shards, 'done' : self.done}, f, ensure_ascii = False)
+    os.replace(self.path.with_suffix('.tmp'), self.path)
+
+
+def summarize(summaries : List[Dict]) -> Dict:
+  emotions = Counter()
+  for x in summaries:
+    emotions.update(x['emotions'])
+  return {'shards' : len(summaries),
+          'novels' : sum(x['novels'] for x in summaries),
+          'sentences' : sum(x['sentences'] for x in summaries),
+          'hits' : sum(x['hits'] for x in summaries),
+          'emotions' : dict(emotions.most_common()),
+          'by_shard' : sorted(summaries, key = lambda x : x['shard'])}
+
+
+def run(input_dir : str,
+        pattern_dir : str,
+        save_dir : str,
+        shard_size : int = 100,
+        workers : int = 1,
+        max_gap : int = 10) -> Dict:
+  """Annotate the unfinished shards and return the summary of all the finished ones.
+  A failed shard does not stop the others : it is left out of the checkpoint and reported in summary['failed']"""
+  if shard_size <= 0:
+    raise ValueError('shard_size must be positive, not %d' % shard_size)
+  Path(save_dir).mkdir(parents = True, exist_ok = True)
+  paths = [str(x) for x in sorted(Path(input_dir).glob('**/*.txt'))]
+  shards = [paths[i:i + shard_size] for i in range(0, len(paths), shard_size)]
+  checkpoint = Checkpoint(save_dir, shards)
+  jobs = [(idx, shard, save_dir) for idx, shard in enumerate(shards) if idx not in checkpoint.done.keys()]
+  print('%d shards, %d done, %d to process' % (len(shards), len(checkpoint.done), len(jobs)))
+
+  failed = dict()
+  if workers > 1:
+    with ProcessPoolExecutor(workers, initializer = _init_worker, initargs = (pattern_dir, max_gap)) as pool:
+      futures = {pool.submit(profiling.in_worker(process_shard), job) : job[0] for job in jobs}
+      for future in as_completed(futures):
+        try:
+          checkpoint.add(profiling.from_worker(future.result()))
+        except Exception as e:
+          failed[futures[future]] = repr(e)
+  else:
+    _init_worker(pattern_dir, max_gap)
+    for job in jobs:
+      try:
+        checkpoint.add(process_shard(job))
+      except Exception as e:
+        failed[job[0]] = repr(e)
+
+  for shard_id, error in sorted(failed.items()):
+    print('shard %d failed : %s' % (shard_id, error), file = sys.stderr)
+
+  summary = summarize(list(checkpoint.done.values()))
+  summary['failed'] = {str(k) : v for k, v in sorted(failed.items())}
+  with open(Path(save_dir) / 'summary.json', 'w', encoding = 'utf-8') as f:
+    json.dump(summary, f, ensure_ascii = False, indent = 2)
+  return summary
+
+
+if __name__ == '__main__':
+  sys.path.append(os.getcwd())
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--input_dir", type=str, help = 'The folder of novels (*.txt, one paragraph per line)')
+  parser.add_argument("--pattern_dir", type=str, help = 'A corpus_*.jsonl file written by corpus_utils.py')
+  parser.add_argument("--save_dir", type=str, default = './annotated')
+  parser.add_argument("--shard_size", type=int, default = 100, help = 'The number of novels in a shard')
+  parser.add_argument("--workers", type=int, default = 1)
+  parser.add_argument("--max_gap", type=int, default = 10)
+  parser.add_argument("--profile", 
+                      type=str, 
+                      default = os.environ.get(profiling.ENV, ''), 
+                      help = 'Record the calls and time of the hot paths and save them in this json file')
+  args = parser.parse_args()
+  if args.profile != '':
+    profiling.enable(args.profile)
+
+  summary = run(args.input_dir, args.pattern_dir, args.save_dir, args.shard_size, args.workers, args.max_gap)
+  print('%d novels, %d sentences, %d hits' % (summary['novels'], summary['sentences'], summary['hits']))
+  if len(summary['failed']) > 0:
+    print('%d shards failed, rerun to retry them : %s' % (len(summary['failed']), ', '.join(summary['failed'].keys())))
+
+  if profiling.enabled():
+    print(profiling.report())
+    profiling.dump(args.profile)
@@ -1,10 +1,7 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 import requests, re, unicodedata
-from boltons.iterutils import pairwise
-from typing import List, Any
-from cached_property import cached_property
+from typing import List, Any, Iterator, Optional
 from src.data.utils import CleanStr
-import numpy as np
 
 
 class WikiNovel:
@@ -13,41 +10,60 @@ class WikiNovel:
     wiki : the url of ko.wikisource
     url: the url of the novel 
     text : a list of paragraphs downloaded from ko.wikisource
+    parser : the parser of bs4, html.parser by default ('lxml' is faster but may build another tree, so it is opt-in)
   """
 
   wiki = 'https://ko.wikisource.org/wiki/'
+  parser = 'html.parser'
 
   def __init__(self, 
-               title : str):
+               title : str,
+               html : Optional[str] = None,
+               parser : Optional[str] = None,
+               wiki : Optional[str] = None):
+    """If html is given (e.g. by novel.download.WikiDownloader), it is parsed without downloading.
+    wiki replaces the base url of ko.wikisource (e.g. a mirror)"""
+    self.wiki = self.wiki if wiki == None else wiki
     self.url = self.wiki + title
+    self.html = html
+    self.parser = self.parser if parser == None else parser
     self.output = self._build()
   
   def _download(self):
-    """Get data from wiki.source with bs4"""
-    response = requests.get(self.url)
-    html = response.text
-    soup = BeautifulSoup(html, 'html.parser')
+    """Get data from wiki.source with bs4, building the tree of the text only"""
+    html = requests.get(self.url).text if self.html == None else self.html
+    soup = BeautifulSoup(html, self.parser, parse_only = SoupStrainer('div', 'mw-parser-output'))
     return soup.find('div', 'mw-parser-output')
   
   def _clear(self, line : str):
     """Delete html tags inside a line"""
     return line.lstrip('<p>').rstrip('</p>').strip('br/>').strip(' ')
 
-  def _get_p(self, soup_list : List[Any]):
-    """Get text only with <p> from the soup list"""
-    txt = [str(t) for t in soup_list if str(t).startswith('<p>')]
-    cleaned = list(map(self._clear, txt))
-    return [x for x in cleaned if len(x) > 0]
-  
-  def _get_parts(self, soup : List[Any]):
+  def _is_p(self, t : Any) -> bool:
+    """Same as str(t).startswith('<p>') without serializing the tags"""
+    if isinstance(t, Tag):
+      return t.name == 'p' and len(t.attrs) == 0
+    return str(t).startswith('<p>')
+
+  def _iter_parts(self, input : Any) -> Iterator[List[str]]:
+    """Yield the text of each run of consecutive <p> in one walk over the children"""
+    part = list()
+    for t in input.children:
+      if self._is_p(t):
+        line = self._clear(str(t))
+        if len(line) > 0:
+          part.append(line)
+      elif len(part) > 0:
+        yield part
+        part = list()
+    if len(part) > 0:
+      yield part
+
+  def _get_parts(self, soup : Any):
     """Get paragraphs from the soup"""
     inside_box =  soup.find('div', 'prose')
     input = inside_box if inside_box != None else soup
-    indice = [idx for idx, t in enumerate(input) if not str(t).startswith('<p>')]
-    indice = sorted(indice + [0, len(input)])
-    parts = [list(input)[s:e] for s,e in pairwise(indice)] #slice with the indices
-    filtered = list(map(lambda x : self._get_p(x), parts)) #leave only <p>
-    return [_ for _ in filtered if len(_) > 0]
+    return list(self._iter_parts(input))
   
   def _build(self):
     soup = self._download()
@@ -0,0 +1,118 @@
+"""Opt-in call counts and cumulative time of the hot paths of the data package
+
+Enabled by the environment variable KORDATA_PROFILE (the json file to save, e.g. KORDATA_PROFILE=profile.json)
+or the --profile flag of kordict_main.py, corpus_utils.py and novel/pipeline.py.
+When it is disabled, an instrumented function costs one extra call and one flag check.
+
+  @instrument('CleanRepr._build')
+  def _build(self): ...
+
+  count('KordictDataset.filtered')
+"""
+import os
+import sys
+import json
+import time
+from functools import partial, wraps
+from typing import Any, Callable, Dict
+
+ENV = 'KORDATA_PROFILE'
+
+_enabled = os.environ.get(ENV, '') != ''
+_timers = dict() #name -> [calls, seconds]
+_counters = dict() #name -> count
+
+
+def enable(path : str = 'profile.json'):
+  """Enable the instrumentation here and in the worker processes started afterwards"""
+  global _enabled
+  _enabled = True
+  os.environ[ENV] = path
+
+
+def enabled() -> bool:
+  return _enabled
+
+
+def instrument(name : str) -> Callable:
+  """Record the number of calls and the time (including the instrumented calls inside) of a function"""
+  def decorator(func : Callable) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      if not _enabled:
+        return func(*args, **kwargs)
+      start = time.perf_counter()
+      try:
+        return func(*args, **kwargs)
+      finally:
+        timer = _timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += time.perf_counter() - start
+    return wrapper
+  return decorator
+
+
+def count(name : str, n : int = 1):
+  if _enabled:
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+  _timers.clear()
+  _counters.clear()
+
+
+def snapshot() -> Dict[str, Dict]:
+  return {'timers' : {k : {'calls' : v[0], 'seconds' : v[1]} for k, v in _timers.items()},
+          'counters' : dict(_counters)}
+
+
+def merge(stats : Dict[str, Dict]):
+  """Add a snapshot (e.g. of a worker process) to the current stats"""
+  for k, v in stats['timers'].items():
+    timer = _timers.setdefault(k, [0, 0.0])
+    timer[0] += v['calls']
+    timer[1] += v['seconds']
+  for k, v in stats['counters'].items():
+    _counters[k] = _counters.get(k, 0) + v
+
+
+def _collect(func : Callable, *args) -> Any:
+  reset()
+  output = func(*args)
+  return output, snapshot()
+
+
+def in_worker(func : Callable) -> Callable:
+  """Wrap a function run in a process pool to return its stats too, to be read with from_worker"""
+  return partial(_collect, func) if _enabled else func
+
+
+def from_worker(result : Any) -> Any:
+  """Merge the stats of a result of in_worker(func) and return the output of func"""
+  if not _enabled:
+    return result
+  output, stats = result
+  merge(stats)
+  return output
+
+
+def report() -> str:
+  """Return the summary table, the slowest first"""
+  lines = ['%-32s %10s %10s %12s' % ('name', 'calls', 'seconds', 'us/call')]
+  for name, (calls, seconds) in sorted(_timers.items(), key = lambda x : -x[1][1]):
+    lines.append('%-32s %10d %10.3f %12.2f' % (name, calls, seconds, seconds / calls * 1e6 if calls > 0 else 0))
+  for name, n in sorted(_counters.items()):
+    lines.append('%-32s %10d' % (name, n))
+  return '\n'.join(lines)
+
+
+def dump(path : str):
+  with open(path, 'w', encoding = 'utf-8') as f:
+    json.dump(snapshot(), f, ensure_ascii = False, indent = 2)
+
+
+#the scripts under src/data import this module as profiling, the novel package as src.data.profiling :
+#register both names so that one process has a single copy of the flag and the stats
+for _name in ['profiling', 'src.data.profiling']:
+  sys.modules.setdefault(_name, sys.modules[__name__])
@@ -1,7 +1,8 @@
 import re
-from typing import List, Tuple, Union, Optional
+import json
+import importlib
+from typing import List, Tuple, Union, Optional, Iterator, Any, TextIO
 from attr import define
-import numpy as np
 
 ROMAN_NUM_UNICODE = [('\u2160', '\u217f')]
 
@@ -35,10 +36,55 @@ INDIRECT = ' ?' + '(' + '|'.join(['(이?라|하)?(고서?는?,? |며,? |면[서
 
 HTML = '</?(a|a href|FL|img|ptrn|DR|sub|sup|equ|sp|each|span|br)([ =/_][^>]*)*>'
 
+def _import(name : str):
+  """Import a module of src/data on its first use, the same way as the imports at the top of the scripts :
+  as a top-level module, or under src.data if it is not on sys.path"""
+  try:
+    return importlib.import_module(name)
+  except ImportError as e:
+    if e.name != name: #the module itself failed on one of its imports
+      raise
+    return importlib.import_module('src.data.' + name)
+
+
 def del_zeros(input_list : List[str]) -> List[str]:
   """Delete empty strings""" 
   return [_.strip(' ') for _ in input_list if len(_.strip(' ')) > 0]
 
+def iter_json_array(f : TextIO, key : str, chunk_size : int = 1 << 16) -> Iterator[Any]:
+  """Yield the elements of the first array named key in a json file one by one 
+  without loading the whole file (e.g. channel.item of a dictionary dump)"""
+  decoder, start, skip = json.JSONDecoder(), re.compile('"%s"\\s*:\\s*\\[' % key), re.compile('[\\s,]*')
+  buffer = ''
+  
+  while True: #find the start of the array
+    chunk = f.read(chunk_size)
+    found = start.search(buffer + chunk)
+    if found:
+      buffer, idx = buffer + chunk, found.end()
+      break
+    elif len(chunk) == 0:
+      return
+    buffer = (buffer + chunk)[-256:] #keep the tail in case the key is split into two chunks
+
+  eof = False
+  while True:
+    idx = skip.match(buffer, idx).end()
+    if buffer.startswith(']', idx):
+      return
+    
+    try:
+      item, idx = decoder.raw_decode(buffer, idx)
+    except json.JSONDecodeError: #the item continues in the next chunk
+      if eof:
+        raise
+      chunk = f.read(chunk_size)
+      eof = len(chunk) == 0
+      buffer, idx = buffer[idx:] + chunk, 0
+      continue
+
+    yield item
+
 def prevent_rx(input: str) -> str:
   #Prevent regex error
   for m in ['\[', '\]', '\.', '\!', '\?', '\^', '\(', '\)', '\-']:
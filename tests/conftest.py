@@ -0,0 +1,26 @@
+"""Make the repository importable as the scripts do, and stand in for data/rx_codes.py when it is not in the checkout"""
+import re
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / 'src' / 'data'
+
+for path in [str(ROOT), str(SRC)]:
+  if path not in sys.path:
+    sys.path.insert(0, path)
+
+#the patterns LineChanger is tested with, see test_line_changer.py
+RX_CODES = {'line_rx' : re.compile('^[\'"].*[\'"]$'),
+            'end_rx' : re.compile('[\\.\\?\\!]'),
+            'indirect_rx' : re.compile(' ?(라고|하고|고|며|는)'),
+            'after_indirect_rx' : re.compile('.*')}
+
+try:
+  import data.rx_codes
+
+except ImportError:
+  rx_codes = types.ModuleType('data.rx_codes')
+  rx_codes.__dict__.update(RX_CODES)
+  sys.modules['data.rx_codes'] = rx_codes
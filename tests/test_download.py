@@ -0,0 +1,77 @@
+"""WikiDownloader against a local http.server : downloading, caching, revalidation and failures"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+
+from src.data.novel.download import WikiDownloader
+
+PAGES = {'운수_좋은_날' : '<div class="mw-parser-output"><p>새침하게 흐린 품이 눈이 올 듯하더니</p></div>',
+         '메밀꽃_필_무렵' : '<div class="mw-parser-output"><p>여름 장이란 애시당초에 글러서</p></div>'}
+
+
+class Handler(BaseHTTPRequestHandler):
+  """200 with an ETag for the pages, 304 if the ETag is sent back, 404 otherwise"""
+  def do_GET(self):
+    title = unquote(self.path[len('/wiki/'):])
+    if title not in PAGES.keys():
+      self.send_error(404)
+      return
+
+    etag = '"%d"' % len(PAGES[title])
+    if self.headers.get('If-None-Match') == etag:
+      self.send_response(304)
+      self.send_header('ETag', etag)
+      self.end_headers()
+      return
+
+    body = PAGES[title].encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/html; charset=utf-8')
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('ETag', etag)
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+@pytest.fixture
+def wiki():
+  server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+  thread = threading.Thread(target = server.serve_forever, daemon = True)
+  thread.start()
+  yield 'http://127.0.0.1:%d/wiki/' % server.server_address[1]
+  server.shutdown()
+  server.server_close()
+
+
+def test_download_cache_revalidate(wiki, tmp_path):
+  titles = list(PAGES.keys())
+  downloader = WikiDownloader(tmp_path, workers = 2, rate = 0, wiki = wiki)
+  assert downloader.fetch_all(titles) == PAGES
+  assert dict(downloader.stats) == {'downloaded' : 2}
+
+  downloader = WikiDownloader(tmp_path, workers = 2, rate = 0, wiki = wiki)
+  assert downloader.fetch_all(titles) == PAGES
+  assert dict(downloader.stats) == {'cached' : 2}
+
+  downloader = WikiDownloader(tmp_path, workers = 2, rate = 0, revalidate = True, wiki = wiki)
+  assert downloader.fetch_all(titles) == PAGES
+  assert dict(downloader.stats) == {'revalidated' : 2}
+
+
+def test_failed_titles(wiki, tmp_path):
+  downloader = WikiDownloader(tmp_path, workers = 2, rate = 0, wiki = wiki)
+  output = downloader.fetch_all(['없는_소설', '운수_좋은_날'])
+  assert output == {'운수_좋은_날' : PAGES['운수_좋은_날']}
+  assert list(downloader.failed.keys()) == ['없는_소설']
+  assert dict(downloader.stats) == {'downloaded' : 1, 'failed' : 1}
+
+
+def test_novels(wiki, tmp_path):
+  novels = WikiDownloader(tmp_path, workers = 2, rate = 0, wiki = wiki).novels(['운수_좋은_날'])
+  assert novels['운수_좋은_날'].url == wiki + '운수_좋은_날'
+  assert novels['운수_좋은_날'].output == [['새침하게 흐린 품이 눈이 올 듯하더니']]
@@ -0,0 +1,52 @@
+"""Regression test of the quotation pairing and sentence splitting of LineChanger"""
+import pytest
+
+from conftest import RX_CODES
+from src.data.novel import etc
+
+
+#the outputs of LineChanger before the pairing was rewritten with bisect (user-014)
+CASES = [
+  ('그는 "정말 기뻐요." 하고 웃었다.', 
+   ['그는 "정말 기뻐요." 하고 웃었다.']),
+  ('"어디 가니?" "학교에 가요." 그녀가 대답했다.', 
+   ['"어디 가니?"', '"학교에 가요."', '그녀가 대답했다.']),
+  ('그녀는 "그가 \'괜찮아\'라고 말했어요."라고 전했다.', #single quotation marks inside double ones
+   ['그녀는 "그가 \'괜찮아\'라고 말했어요." 라고 전했다.']),
+  ("그는 '귀여운' 강아지를 보았다. 정말 좋았다!", #emphasis
+   ["그는 '귀여운' 강아지를 보았다.", '정말 좋았다!']),
+  ('그는 "끝나지 않은 말을 했다. 그리고 떠났다.', #unbalanced
+   ['그는 "끝나지 않은 말을 했다.', '그리고 떠났다.']),
+  ("\"첫째 줄.\" '둘째 줄이다.' \"셋째 줄!\"", 
+   ['"첫째 줄."', "'둘째 줄이다.'", '"셋째 줄!"']),
+  ('비가 왔다. 그는 우산을 폈다? 아니다, 그냥 걸었다.', 
+   ['비가 왔다.', '그는 우산을 폈다?', '아니다, 그냥 걸었다.']),
+  ('"나는 \'진짜\' 몰라요. 정말이에요." 그가 말했다. \'그렇구나.\' 그녀는 생각했다.', #nested
+   ['"나는 \'진짜\' 몰라요. 정말이에요."', '그가 말했다.', "'그렇구나.'", '그녀는 생각했다.']),
+  ('그는 "가자"고 말했다.', #indirect quotation
+   ['그는 "가자" 고 말했다.']),
+  ('"하나." \'둘.\' "셋.', #unbalanced after nested pairs
+   ['"하나."', "'둘.'", '"셋.']),
+]
+
+
+@pytest.fixture(autouse = True)
+def rx_codes(monkeypatch):
+  """The expected outputs depend on the patterns, so use the same ones whatever data/rx_codes.py holds"""
+  for name, value in RX_CODES.items():
+    monkeypatch.setattr(etc, name, value)
+
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_output(text, expected):
+  assert etc.LineChanger(text).output == expected
+
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_streaming(text, expected):
+  assert list(etc.LineChanger(text, True).output) == expected
+
+
+def test_stream():
+  texts = [text for text, _ in CASES]
+  assert list(etc.LineChanger.stream(texts)) == sum([expected for _, expected in CASES], [])
@@ -0,0 +1,18 @@
+"""The profiling stats are shared whichever name the module is imported under"""
+import profiling
+from src.data import profiling as package_profiling
+from src.data.profiling import instrument
+
+
+def test_single_module():
+  assert profiling is package_profiling
+
+
+def test_shared_stats(monkeypatch):
+  monkeypatch.setattr(profiling, '_enabled', True)
+  profiling.reset()
+  instrument('test')(lambda : None)()
+  package_profiling.count('test')
+  assert profiling.snapshot()['timers']['test']['calls'] == 1
+  assert profiling.snapshot()['counters'] == {'test' : 1}
+  profiling.reset()